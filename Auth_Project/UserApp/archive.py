@@ -0,0 +1,211 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from .models import ActivityArchive, ActivityLog, SearchDocument
+
+logger = logging.getLogger(__name__)
+
+TABLE = ActivityLog._meta.db_table
+
+
+def month_start(value):
+    return value.astimezone(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    for _ in range(count):
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    return month
+
+
+def hot_since(now=None):
+    """
+    Start of the oldest month kept in the database: the current month plus
+    ACTIVITY_LOG_RETENTION_MONTHS before it. Anything older is archived.
+    """
+    month = month_start(now or timezone.now())
+    for _ in range(settings.ACTIVITY_LOG_RETENTION_MONTHS):
+        month = month_start(month - datetime.timedelta(days=1))
+    return month
+
+
+def recent_activity():
+    """
+    The activity log limited to the retention window, so PostgreSQL only
+    scans the hot partitions.
+    """
+    return ActivityLog.objects.filter(created_at__gte=hot_since())
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def _partition_exists(month):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [f'"{partition_name(month)}"'])
+        return cursor.fetchone()[0] is not None
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Creates the monthly partitions for the current month and the next
+    `months_ahead` ones, so new entries do not land in the DEFAULT
+    partition. PostgreSQL only; returns the partitions created.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    if months_ahead is None:
+        months_ahead = settings.ACTIVITY_LOG_PARTITIONS_AHEAD
+    created = []
+    month = month_start(timezone.now())
+    for _ in range(months_ahead + 1):
+        if not _partition_exists(month):
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            f'CREATE TABLE "{partition_name(month)}" PARTITION OF "{TABLE}" '
+                            "FOR VALUES FROM (%s) TO (%s)",
+                            [month, add_months(month, 1)],
+                        )
+                created.append(partition_name(month))
+            except DatabaseError:
+                # The DEFAULT partition already holds rows for this month.
+                logger.warning("Could not create partition %s", partition_name(month), exc_info=True)
+        month = add_months(month, 1)
+    return created
+
+
+def archivable_months(now=None):
+    """
+    First-of-month datetimes for every month before hot_since() that still
+    has rows in the database.
+    """
+    cutoff = hot_since(now)
+    oldest = ActivityLog.objects.filter(created_at__lt=cutoff).aggregate(oldest=Min('created_at'))['oldest']
+    months = []
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def month_rows(month):
+    return ActivityLog.objects.filter(created_at__gte=month, created_at__lt=add_months(month, 1))
+
+
+def _label(content_type_id):
+    if content_type_id is None:
+        return None
+    return '.'.join(ContentType.objects.get_for_id(content_type_id).natural_key())
+
+
+def activity_row(entry):
+    return {
+        'id': entry.pk,
+        'user_id': entry.user_id,
+        'username': entry.user.username if entry.user_id else None,
+        'role': entry.role,
+        'event': entry.event,
+        'target_type': _label(entry.target_type_id),
+        'target_id': entry.target_id,
+        'data': entry.data,
+        'action': entry.action,
+        'created_at': entry.created_at,
+    }
+
+
+def _write_part(month, directory, batch_size):
+    """
+    Streams the month's rows, oldest first, into a new gzipped JSONL file
+    and returns (path, rows, last id). The file only gets its final name
+    once it is complete and synced, so a crash never leaves a partial part.
+    """
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f".activity-{month:%Y-%m}.jsonl.gz.partial")
+    rows = last_id = 0
+    queryset = month_rows(month).select_related('user').order_by('id')
+    with open(temporary, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as stream:
+        for entry in queryset.iterator(chunk_size=batch_size):
+            stream.write(json.dumps(activity_row(entry), cls=DjangoJSONEncoder) + '\n')
+            rows += 1
+            last_id = entry.pk
+        stream.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+    if not rows:
+        os.remove(temporary)
+        return None, 0, 0
+    path = os.path.join(directory, f"activity-{month:%Y-%m}-{last_id}.jsonl.gz")
+    os.replace(temporary, path)
+    return path, rows, last_id
+
+
+def _purge(month, last_id, batch_size):
+    """
+    Deletes the month's rows up to `last_id` (and their search documents)
+    a batch at a time, each batch in its own short transaction. When a
+    PostgreSQL partition holds nothing else, it is dropped instead.
+    """
+    rows = month_rows(month).filter(id__lte=last_id)
+    use_partition = (
+        connection.vendor == 'postgresql'
+        and _partition_exists(month)
+        and not month_rows(month).filter(id__gt=last_id).exists()
+    )
+    deleted = 0
+    while True:
+        ids = list(rows.filter(id__gt=deleted).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            SearchDocument.objects.filter(kind='activity', object_id__in=ids).delete()
+            if not use_partition:
+                # A raw delete: nothing cascades from ActivityLog, and
+                # Collector would fire post_delete once per row.
+                ActivityLog.objects.filter(id__in=ids)._raw_delete(ActivityLog.objects.db)
+        deleted = ids[-1]
+    if use_partition:
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{partition_name(month)}"')
+            cursor.execute(f'DROP TABLE "{partition_name(month)}"')
+
+
+def archive_month(month, directory=None, batch_size=None):
+    """
+    Moves one month of the activity log to compressed JSONL files and out of
+    the database. Safe to rerun: rows already covered by an ActivityArchive
+    part are only deleted, not written again. Returns the rows archived.
+    """
+    directory = directory or settings.ACTIVITY_LOG_ARCHIVE_DIR
+    batch_size = batch_size or settings.ACTIVITY_LOG_ARCHIVE_BATCH_SIZE
+    archived_up_to = ActivityArchive.objects.filter(month=month.date()).aggregate(last=Max('last_id'))['last']
+    if archived_up_to:
+        # Finish a run that stopped between writing the file and deleting.
+        _purge(month, archived_up_to, batch_size)
+
+    path, rows, last_id = _write_part(month, directory, batch_size)
+    if not rows:
+        return 0
+    ActivityArchive.objects.create(month=month.date(), path=path, rows=rows, last_id=last_id)
+    _purge(month, last_id, batch_size)
+    return rows
+
+
+def read_archive(path):
+    """
+    Yields the rows of one archive file as dicts.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as stream:
+        for line in stream:
+            yield json.loads(line)
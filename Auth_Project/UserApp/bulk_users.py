@@ -0,0 +1,191 @@
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .counters import bump
+from .hashers import setup_worker
+from .models import Profile
+from .permissions import invalidate_roles
+
+User = get_user_model()
+
+USER_FIELDS = ('username', 'email', 'role', 'first_name', 'last_name', 'is_active')
+PROFILE_FIELDS = ('firstname', 'lastname', 'dob', 'phone', 'country', 'city', 'postalcode')
+EXPORT_FIELDS = USER_FIELDS + ('date_joined',) + PROFILE_FIELDS
+
+
+def read_rows(stream, fmt):
+    """
+    Yields (line number, row dict) from a CSV (with a header row) or JSONL
+    stream without reading it all into memory.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, exc
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+
+def hashing_pool(workers):
+    # Spawned, like the thumbnail pool: forking would copy open DB connections.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=setup_worker,
+    )
+
+
+def _text(row, name):
+    return str(row.get(name) or '').strip()
+
+
+def _as_bool(value, default):
+    if isinstance(value, bool):
+        return value
+    value = str(value if value is not None else '').strip().lower()
+    if not value:
+        return default
+    return value not in ('0', 'false', 'no')
+
+
+def build_user(row):
+    """
+    Validates one input row and returns unsaved (user, profile, password).
+    `password` is the raw password to hash, or None when the row carried a
+    ready-made `password_hash` (or no password at all).
+    """
+    values = {name: _text(row, name) for name in USER_FIELDS if name != 'is_active'}
+    values['role'] = values['role'] or 'employee'
+    user = User(**values, is_active=_as_bool(row.get('is_active'), True))
+    user.clean_fields(exclude=['password', 'date_joined', 'last_login'])
+
+    profile_values = {name: _text(row, name) for name in PROFILE_FIELDS}
+    profile_values['dob'] = profile_values['dob'] or None
+    profile = Profile(**profile_values)
+    profile.clean_fields(exclude=['user', 'profile_image'])
+
+    password = row.get('password') or None
+    password_hash = row.get('password_hash')
+    if password_hash and password:
+        raise ValidationError("Give either password or password_hash, not both.")
+    if password_hash:
+        try:
+            identify_hasher(password_hash)
+        except ValueError:
+            raise ValidationError("password_hash is not in a recognised format.")
+        user.password = password_hash
+    elif password:
+        # The same policy registration enforces.
+        validate_password(password, user)
+    else:
+        user.set_unusable_password()
+    return user, profile, password
+
+
+def _error_text(exc):
+    if isinstance(exc, ValidationError):
+        if hasattr(exc, 'error_dict'):
+            return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in exc.message_dict.items())
+        return ' '.join(exc.messages)
+    return str(exc)
+
+
+def import_batch(batch, pool, seen):
+    """
+    Validates, hashes and inserts one batch of (line number, row) pairs in a
+    single transaction. Passwords are hashed on `pool` (in this process when
+    it is None). `seen` collects ('username' or 'email', value) pairs across
+    batches, so duplicates within the file are caught as well as those in
+    the database. Returns (created count, sorted [(line number, error)]).
+    """
+    errors = []
+    valid = []
+    for line_number, row in batch:
+        if isinstance(row, Exception):
+            errors.append((line_number, _error_text(row)))
+            continue
+        try:
+            valid.append((line_number, *build_user(row)))
+        except ValidationError as exc:
+            errors.append((line_number, _error_text(exc)))
+
+    existing = {('username', name) for name in User.objects.filter(
+        username__in=[user.username for _, user, _, _ in valid]).values_list('username', flat=True)}
+    existing |= {('email', email) for email in User.objects.filter(
+        email__in=[user.email for _, user, _, _ in valid if user.email]).values_list('email', flat=True)}
+    unique = []
+    for entry in valid:
+        keys = [('username', entry[1].username)]
+        if entry[1].email:
+            keys.append(('email', entry[1].email))
+        taken = [(field, value) for field, value in keys if (field, value) in existing or (field, value) in seen]
+        if taken:
+            errors.append((entry[0], '; '.join(f"{field}: '{value}' already exists." for field, value in taken)))
+            continue
+        seen.update(keys)
+        unique.append(entry)
+
+    to_hash = [entry for entry in unique if entry[3]]
+    passwords = [entry[3] for entry in to_hash]
+    hashed = pool.map(make_password, passwords, chunksize=8) if pool else map(make_password, passwords)
+    for entry, encoded in zip(to_hash, hashed):
+        entry[1].password = encoded
+
+    if not unique:
+        return 0, sorted(errors)
+    users = [user for _, user, _, _ in unique]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            if users[0].pk is None:
+                # Backends that cannot return ids from a bulk insert.
+                ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+            profiles = []
+            for _, user, profile, _ in unique:
+                profile.user = user
+                profiles.append(profile)
+            Profile.objects.bulk_create(profiles)
+            # bulk_create skips the post_save receivers, so do their work here.
+            bump('user', len(users))
+            bump('user', len(users), day=timezone.localdate())
+            invalidate_roles()
+    except IntegrityError as exc:
+        errors.extend((line_number, f"batch rolled back: {exc}") for line_number, *_ in unique)
+        return 0, sorted(errors)
+    return len(users), sorted(errors)
+
+
+def export_rows(queryset=None, password_hashes=False):
+    """
+    Yields one dict per user, profile fields included, reading the table in
+    chunks so memory stays flat however many users there are. With
+    `password_hashes` the rows can be fed back to import_users as-is.
+    """
+    queryset = queryset if queryset is not None else User.objects.all()
+    for user in queryset.select_related('profile').order_by('id').iterator(chunk_size=2000):
+        try:
+            profile = user.profile
+        except Profile.DoesNotExist:
+            profile = None
+        row = {name: getattr(user, name) for name in USER_FIELDS + ('date_joined',)}
+        row.update({name: getattr(profile, name) if profile else '' for name in PROFILE_FIELDS})
+        if password_hashes:
+            row['password_hash'] = user.password
+        yield row
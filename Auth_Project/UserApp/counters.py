@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Category, Counter, File, UploadedFile
+
+User = get_user_model()
+
+# Counter name -> (model, timestamp field used for the per-day rows, or None).
+COUNTED_MODELS = {
+    'uploadedfile': (UploadedFile, 'uploaded_at'),
+    'file': (File, 'uploaded_at'),
+    'category': (Category, None),
+    'user': (User, 'date_joined'),
+}
+
+
+def counter_name_for(model):
+    for name, (counted, _) in COUNTED_MODELS.items():
+        if counted is model:
+            return name
+    return None
+
+
+def bump(name, delta, day=None):
+    """
+    Adds `delta` to a counter row inside the caller's transaction, creating
+    the row on first use.
+    """
+    updated = Counter.objects.filter(name=name, day=day).update(value=F('value') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            Counter.objects.create(name=name, day=day, value=delta)
+    except IntegrityError:
+        Counter.objects.filter(name=name, day=day).update(value=F('value') + delta)
+
+
+def record(instance, delta):
+    name = counter_name_for(type(instance))
+    if name is None:
+        return
+    _, stamp_field = COUNTED_MODELS[name]
+    bump(name, delta)
+    stamp = getattr(instance, stamp_field, None) if stamp_field else None
+    if stamp:
+        bump(name, delta, day=timezone.localdate(stamp))
+
+
+def totals(*names):
+    """
+    Current totals for the given counters in one query; missing counters read as 0.
+    """
+    values = dict(
+        Counter.objects.filter(name__in=names, day__isnull=True).values_list('name', 'value')
+    )
+    return {name: values.get(name, 0) for name in names}
+
+
+def rebuild():
+    """
+    Recomputes every counter from the source tables. Needed after bulk
+    writes or raw SQL, which bypass the signal handlers.
+    """
+    rows = []
+    for name, (model, stamp_field) in COUNTED_MODELS.items():
+        rows.append(Counter(name=name, day=None, value=model.objects.count()))
+        if stamp_field:
+            per_day = (
+                model.objects
+                .annotate(day=TruncDate(stamp_field))
+                .values_list('day')
+                .annotate(count=Count('pk'))
+                .order_by()
+            )
+            rows.extend(Counter(name=name, day=day, value=count) for day, count in per_day)
+
+    with transaction.atomic():
+        Counter.objects.all().delete()
+        Counter.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
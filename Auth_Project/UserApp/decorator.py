@@ -3,7 +3,9 @@ from django.shortcuts import redirect
 def role_required(allowed_roles=[]):
     def decorator(view_func):
         def wrapper(request, *args, **kwargs):
-            if request.user.role in allowed_roles:
+            # With CachedUserMiddleware installed (REDIS_URL set), request.user
+            # comes from the cache and the role check does not hit the database.
+            if getattr(request.user, 'role', None) in allowed_roles:
                 return view_func(request, *args, **kwargs)
             else:
                 return redirect('dashboard')
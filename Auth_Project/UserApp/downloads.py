@@ -0,0 +1,121 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+from .exports import aiterate
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def file_etag(size, mtime):
+    return f'"{size:x}-{int(mtime):x}"'
+
+
+def parse_range(header, size):
+    """
+    Returns (start, end) for a single satisfiable byte range, None when the
+    header should be ignored (absent or multi-range), or False when the
+    range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        length = int(last)
+        if length == 0:
+            return False
+        start = max(size - length, 0)
+        end = size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def read_range(handle, start, length):
+    try:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def serve_file(request, field_file, as_attachment=True):
+    """
+    Streams a FileField's content with ETag/Last-Modified validation and
+    single-range support, or hands the transfer to the front-end server when
+    FILE_DOWNLOAD_OFFLOAD is 'nginx' or 'sendfile'.
+    """
+    return serve_stored(request, field_file.storage, field_file.name, as_attachment)
+
+
+def serve_stored(request, storage, name, as_attachment=True):
+    try:
+        size = storage.size(name)
+        mtime = storage.get_modified_time(name).timestamp()
+    except OSError:
+        # The row outlived its blob (garbage collected or never written).
+        raise Http404("File not found.")
+    etag = file_etag(size, mtime)
+    filename = os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if not_modified is not None:
+        return not_modified
+
+    offload = settings.FILE_DOWNLOAD_OFFLOAD
+    if offload:
+        response = HttpResponse(content_type=content_type)
+        if offload == 'nginx':
+            response['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_ACCEL_PREFIX + quote(name)
+        else:
+            response['X-Sendfile'] = storage.path(name)
+    else:
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag:
+            byte_range = parse_range(request.headers.get('Range'), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1
+        if byte_range or isinstance(request, ASGIRequest):
+            content = read_range(storage.open(name, 'rb'), start, length)
+            if isinstance(request, ASGIRequest):
+                # Under ASGI a sync iterator would be read into a list first.
+                content = aiterate(content)
+            response = StreamingHttpResponse(content, status=206 if byte_range else 200, content_type=content_type)
+            response['Content-Length'] = str(length)
+            if byte_range:
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+            response.block_size = CHUNK_SIZE
+
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    return response
@@ -0,0 +1,146 @@
+import csv
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from .archive import activity_row, recent_activity
+from .forms import ActivityLogFilterForm
+from .models import FileCategoryMapping
+from .permissions import visible_files
+
+ACTIVITY_FIELDS = (
+    'id', 'created_at', 'user_id', 'username', 'role', 'event', 'target_type', 'target_id', 'data', 'action',
+)
+FILE_FIELDS = ('id', 'title', 'description', 'file', 'uploader', 'uploaded_at', 'updated_by', 'updated_at')
+ASSIGNMENT_FIELDS = (
+    'id', 'file_id', 'file', 'category', 'assigned_to', 'assigned_by', 'assigned_at', 'reassigned_by', 'reassigned_at',
+)
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _username(user):
+    return user.username if user is not None else None
+
+
+def activity_rows(request):
+    queryset = ActivityLogFilterForm(request.GET).filter(recent_activity())
+    for entry in queryset.select_related('user').order_by('-created_at', '-id').iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield activity_row(entry)
+
+
+def file_rows(request):
+    queryset = visible_files(request.user).select_related('uploader', 'updated_by').order_by('-uploaded_at', '-id')
+    for file in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield {
+            'id': file.pk,
+            'title': file.title,
+            'description': file.description or '',
+            'file': file.file.name,
+            'uploader': file.uploader.username,
+            'uploaded_at': file.uploaded_at,
+            'updated_by': _username(file.updated_by),
+            'updated_at': file.updated_at,
+        }
+
+
+def assignment_rows(request):
+    queryset = (
+        FileCategoryMapping.objects
+        .select_related('file', 'category', 'assigned_to', 'assigned_by', 'reassigned_by')
+        .order_by('-assigned_at', '-id')
+    )
+    for mapping in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield {
+            'id': mapping.pk,
+            'file_id': mapping.file_id,
+            'file': mapping.file.title,
+            'category': mapping.category.name,
+            'assigned_to': _username(mapping.assigned_to),
+            'assigned_by': _username(mapping.assigned_by),
+            'assigned_at': mapping.assigned_at,
+            'reassigned_by': _username(mapping.reassigned_by),
+            'reassigned_at': mapping.reassigned_at,
+        }
+
+
+# dataset name -> (columns, row generator taking the request)
+DATASETS = {
+    'activity': (ACTIVITY_FIELDS, activity_rows),
+    'files': (FILE_FIELDS, file_rows),
+    'assignments': (ASSIGNMENT_FIELDS, assignment_rows),
+}
+
+
+class Echo:
+    """
+    A write-only "file" that hands back what csv.writer writes to it, so each
+    row can be yielded instead of buffered.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, cls=DjangoJSONEncoder)
+    elif hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Titles and actions are user input; keep spreadsheets from
+        # evaluating them as formulas.
+        return "'" + value
+    return value
+
+
+def encode(rows, fields, fmt, chunk_rows=None):
+    """
+    Yields the rows as CSV (with a header) or JSONL text, joined into chunks
+    of `chunk_rows` rows so the server is not handed one tiny write per row.
+    """
+    chunk_rows = chunk_rows or settings.EXPORT_CHUNK_SIZE
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(fields)] if fmt == 'csv' else []
+    for row in rows:
+        if fmt == 'csv':
+            lines.append(writer.writerow([_csv_value(row[name]) for name in fields]))
+        else:
+            lines.append(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        if len(lines) >= chunk_rows:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+async def aiterate(iterator):
+    # Under ASGI, Django would read a sync iterator into a list before
+    # sending it; pulling one chunk at a time keeps memory flat. Each chunk
+    # runs in the same sync thread, so the database cursor stays usable.
+    sentinel = object()
+    while True:
+        chunk = await sync_to_async(next)(iterator, sentinel)
+        if chunk is sentinel:
+            return
+        yield chunk
+
+
+def export_response(request, dataset, fmt):
+    """
+    A StreamingHttpResponse with every row of `dataset`, read from the
+    database in EXPORT_CHUNK_SIZE batches, whatever the export's size.
+    """
+    fields, rows = DATASETS[dataset]
+    content = encode(rows(request), fields, fmt)
+    if isinstance(request, ASGIRequest):
+        content = aiterate(content)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+    filename = f"{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
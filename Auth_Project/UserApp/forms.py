@@ -1,9 +1,15 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from .models import CustomUser, File, FileCategoryMapping, Profile
+from datetime import datetime, time, timedelta
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from .models import ActivityLog, Category, CustomUser, File, FileCategoryMapping, Profile
 from UserApp.utils import get_daily_passcode 
+from . import lockout
+from .utils import client_ip
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from .models import CustomUser
@@ -48,6 +54,27 @@ class CustomAuthenticationForm(AuthenticationForm):
         model = CustomUser
         fields = ('username', 'password')
 
+    def clean(self):
+        # Throttle before AuthenticationForm.clean() runs the password hasher.
+        username = self.cleaned_data.get('username') or ''
+        ip = client_ip(self.request) if self.request else ''
+        wait = lockout.locked_for(username, ip)
+        if wait:
+            raise ValidationError(
+                f"Too many failed login attempts. Try again in {wait} seconds.",
+                code='locked',
+            )
+        try:
+            cleaned_data = super().clean()
+        except ValidationError:
+            lockout.record_failure(username, ip)
+            raise
+        # clean() also returns normally when a field was missing and no
+        # authentication happened; only a real login clears the window.
+        if self.user_cache is not None:
+            lockout.record_success(username, ip)
+        return cleaned_data
+
 class ForgotPasswordForm(forms.Form):
     username = forms.CharField(max_length=150, label="Username")
     new_password = forms.CharField(widget=forms.PasswordInput, label="New Password")
@@ -110,6 +137,18 @@ class FileUploadForm(forms.ModelForm):
         model = File
         fields = ['title', 'description', 'file']
 
+class ChunkedUploadInitForm(forms.Form):
+    title = forms.CharField(max_length=255)
+    description = forms.CharField(required=False)
+    filename = forms.CharField(max_length=255)
+    size = forms.IntegerField(min_value=1)
+
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise forms.ValidationError("File is too large.")
+        return size
+
 class FileCategoryMappingForm(forms.ModelForm):
     assign_to = forms.ModelChoiceField(
         queryset=CustomUser.objects.filter(role='employee'),
@@ -124,6 +163,64 @@ class FileCategoryMappingForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['file'].queryset = File.objects.select_related('uploader')
         self.fields['file'].empty_label = "Select a file"
         self.fields['category'].empty_label = "Select a category"
         self.fields['assign_to'].empty_label = "Select an employee"
+
+class AssignmentUpdateForm(forms.Form):
+    """
+    The reassignment controls on the category page: an optional new category
+    and the employees to give access to. Unknown or malformed ids become
+    form errors instead of reaching the database.
+    """
+    category = forms.ModelChoiceField(queryset=Category.objects.all(), required=False)
+    assign_to = forms.ModelMultipleChoiceField(queryset=CustomUser.objects.filter(role='employee'), required=False)
+
+    def error_text(self):
+        return ' '.join(message for messages in self.errors.values() for message in messages)
+
+class ActivityLogFilterForm(forms.Form):
+    """
+    The activity log filters. Each one maps onto an ActivityLog index that
+    ends in (-created_at, -id), so filtered pages stay index scans.
+    """
+    TARGET_MODELS = {'file': File, 'category': Category, 'user': CustomUser}
+
+    user = forms.CharField(required=False, label="Username",
+                           widget=forms.TextInput(attrs={'class': 'form-control'}))
+    event = forms.ChoiceField(required=False, choices=(('', 'All events'),) + ActivityLog.EVENT_CHOICES,
+                              widget=forms.Select(attrs={'class': 'form-select'}))
+    target_type = forms.ChoiceField(
+        required=False,
+        choices=(('', 'Any target'), ('file', 'File'), ('category', 'Category'), ('user', 'User')),
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    target_id = forms.IntegerField(required=False, min_value=1, label="Target ID",
+                                   widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    since = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    until = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+
+    def filter(self, queryset):
+        """
+        Narrows an ActivityLog queryset by whichever filters are valid;
+        invalid ones are ignored rather than emptying the page.
+        """
+        self.is_valid()
+        data = self.cleaned_data
+        if data.get('user'):
+            queryset = queryset.filter(user__username=data['user'])
+        if data.get('event'):
+            queryset = queryset.filter(event=data['event'])
+        if data.get('target_type'):
+            queryset = queryset.filter(
+                target_type=ContentType.objects.get_for_model(self.TARGET_MODELS[data['target_type']])
+            )
+            if data.get('target_id'):
+                queryset = queryset.filter(target_id=data['target_id'])
+        if data.get('since'):
+            queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(data['since'], time.min)))
+        if data.get('until'):
+            end = data['until'] + timedelta(days=1)
+            queryset = queryset.filter(created_at__lt=timezone.make_aware(datetime.combine(end, time.min)))
+        return queryset
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def setup_worker():
+    """
+    Initializer for processes that hash passwords. Lives here because this
+    module can be imported before django.setup(), unlike anything that
+    imports models.
+    """
+    import django
+    django.setup()
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 at PASSWORD_PBKDF2_ITERATIONS. Stored hashes at any other
+    count are re-encoded on the next successful login (must_update).
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    # Needs argon2-cffi.
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
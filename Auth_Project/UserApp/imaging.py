@@ -0,0 +1,38 @@
+"""
+Image work that runs in the thumbnail process pool. Kept free of Django
+imports so spawned workers start quickly.
+"""
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+
+def render_thumbnail(source, target, size, image_format, crop=False):
+    """
+    Writes a `size` thumbnail of the first frame of `source` to `target`.
+    Returns False when the source is not an image Pillow can read.
+    """
+    if os.path.exists(target):
+        return True
+    try:
+        with Image.open(source) as image:
+            image.seek(0)
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            if image_format == 'JPEG' and image.mode == 'RGBA':
+                image = image.convert('RGB')
+            if crop:
+                image = ImageOps.fit(image, size, Image.LANCZOS)
+            else:
+                image.thumbnail(size, Image.LANCZOS)
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.thumb-')
+            with os.fdopen(handle, 'wb') as out:
+                image.save(out, image_format, quality=82)
+            os.replace(temp_path, target)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+    return True
@@ -0,0 +1,60 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .ratelimit import clear, sliding_window
+from .utils import log_event
+
+
+def _identities(username, ip):
+    # Usernames are hashed so arbitrary input never ends up in a cache key.
+    name = hashlib.sha256(username.strip().lower().encode()).hexdigest()
+    return [('login-user', name), ('login-ip', ip)]
+
+
+def _lock_key(scope, identity):
+    return f"userapp:lock:{scope}:{identity}"
+
+
+def _strike_key(scope, identity):
+    return f"userapp:strikes:{scope}:{identity}"
+
+
+def locked_for(username, ip):
+    """
+    Seconds until `username` or `ip` may try again, 0 if neither is locked.
+    One cache round trip, and no password hashing, so rejecting a locked
+    caller is cheap.
+    """
+    keys = [_lock_key(scope, identity) for scope, identity in _identities(username, ip)]
+    now = time.time()
+    until = max(cache.get_many(keys).values(), default=0)
+    return max(0, int(until - now + 0.999))
+
+
+def record_failure(username, ip):
+    """
+    Counts a failed login against both the username and the IP. Going over
+    LOGIN_FAILURE_LIMIT within LOGIN_FAILURE_WINDOW locks that identity,
+    for twice as long as last time (up to LOGIN_LOCKOUT_MAX).
+    """
+    for scope, identity in _identities(username, ip):
+        limit = settings.LOGIN_FAILURE_LIMIT[scope]
+        if sliding_window(scope, identity, settings.LOGIN_FAILURE_WINDOW) < limit:
+            continue
+
+        strike_key = _strike_key(scope, identity)
+        strikes = cache.get(strike_key, 0)
+        duration = min(settings.LOGIN_LOCKOUT_BASE * 2 ** strikes, settings.LOGIN_LOCKOUT_MAX)
+        cache.set(_lock_key(scope, identity), time.time() + duration, duration)
+        cache.set(strike_key, strikes + 1, settings.LOGIN_LOCKOUT_MAX * 4)
+        clear(scope, identity)
+
+        target = f"username '{username}'" if scope == 'login-user' else f"IP {ip}"
+        log_event(None, 'login_locked', subject=target, seconds=duration, attempts=limit)
+
+
+def record_success(username, ip):
+    scope, identity = _identities(username, ip)[0]
+    clear(scope, identity)
+    cache.delete(_strike_key(scope, identity))
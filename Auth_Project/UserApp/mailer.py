@@ -0,0 +1,156 @@
+import logging
+import threading
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed message is hidden from other workers while it is sent.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def enqueue_mail(subject, body, recipients, from_email=None):
+    """
+    Stores a message in the outbox and wakes the delivery worker once the
+    surrounding transaction commits. Returns immediately.
+    """
+    message = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=','.join(recipients),
+    )
+    transaction.on_commit(mail_worker.wake)
+    return message
+
+
+async def aenqueue_mail(subject, body, recipients, from_email=None):
+    """
+    enqueue_mail() for async views. Async ORM calls run in autocommit, so the
+    row is committed once acreate() returns and the worker can be woken
+    straight away (on a thread, since with MAIL_QUEUE_ASYNC off it sends).
+    """
+    message = await OutboundEmail.objects.acreate(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=','.join(recipients),
+    )
+    await sync_to_async(mail_worker.wake)()
+    return message
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(settings.MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.MAIL_RETRY_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if due:
+            OutboundEmail.objects.filter(id__in=[m.id for m in due]).update(next_attempt_at=now + CLAIM_LEASE)
+    return due
+
+
+def deliver_pending(batch_size=None):
+    """
+    Sends one batch of due messages over a single backend connection.
+    Failures are rescheduled with exponential backoff and marked dead after
+    MAIL_MAX_ATTEMPTS. Returns the number of messages sent.
+
+    Bodies are blanked once a message is sent or dead: they can hold
+    one-time codes, which should not outlive delivery in the database.
+    """
+    batch = claim_batch(batch_size or settings.MAIL_BATCH_SIZE)
+    if not batch:
+        return 0
+
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        for message in batch:
+            _record_failure(message, exc)
+        return 0
+
+    try:
+        for message in batch:
+            email = EmailMessage(
+                message.subject, message.body, message.from_email, message.to.split(','), connection=connection,
+            )
+            try:
+                email.send()
+            except Exception as exc:
+                _record_failure(message, exc)
+            else:
+                OutboundEmail.objects.filter(id=message.id).update(
+                    status='sent', sent_at=timezone.now(), attempts=message.attempts + 1, last_error='', body='',
+                )
+                sent += 1
+    finally:
+        connection.close()
+    return sent
+
+
+def _record_failure(message, exc):
+    attempts = message.attempts + 1
+    logger.warning("Mail %s failed (attempt %d): %s", message.id, attempts, exc)
+    update = {'attempts': attempts, 'last_error': str(exc)[:1000]}
+    if attempts >= settings.MAIL_MAX_ATTEMPTS:
+        update['status'] = 'dead'
+        update['body'] = ''
+    else:
+        update['next_attempt_at'] = timezone.now() + retry_delay(attempts)
+    OutboundEmail.objects.filter(id=message.id).update(**update)
+
+
+class MailWorker:
+    """
+    Background thread that drains the outbox whenever a message is queued
+    and otherwise polls for retries. With MAIL_QUEUE_ASYNC off, wake()
+    delivers inline instead.
+    """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        if not settings.MAIL_QUEUE_ASYNC:
+            deliver_pending()
+            return
+        self._ensure_started()
+        self._wake.set()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-worker', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                while deliver_pending():
+                    pass
+            except Exception:
+                logger.exception("Mail worker batch failed")
+
+
+mail_worker = MailWorker(poll_interval=settings.MAIL_POLL_INTERVAL)
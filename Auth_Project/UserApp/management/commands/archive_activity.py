@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from UserApp.archive import archivable_months, archive_month, ensure_partitions, hot_since, month_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Move activity log months older than ACTIVITY_LOG_RETENTION_MONTHS to gzipped JSONL files, "
+        "and create upcoming monthly partitions on PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=settings.ACTIVITY_LOG_ARCHIVE_DIR)
+        parser.add_argument('--batch-size', type=int, default=settings.ACTIVITY_LOG_ARCHIVE_BATCH_SIZE,
+                            help="Rows deleted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the months that would be archived.")
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            for name in ensure_partitions():
+                self.stdout.write(f"Created partition {name}")
+
+        months = archivable_months()
+        self.stdout.write(f"Keeping activity since {hot_since():%Y-%m}; {len(months)} month(s) to archive.")
+        total = 0
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f"{month:%Y-%m}: {month_rows(month).count()} rows")
+                continue
+            rows = archive_month(month, options['output_dir'], options['batch_size'])
+            total += rows
+            self.stdout.write(f"{month:%Y-%m}: archived {rows} rows")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Archived {total} activity log entries to {options['output_dir']}."))
@@ -0,0 +1,47 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand
+from UserApp.hashers import setup_worker
+
+
+def _hash_rate(algorithm, seconds):
+    # Runs in a worker process, set up by hashers.setup_worker.
+    hasher = get_hasher(algorithm)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        hasher.encode('correct horse battery staple', hasher.salt())
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = "Measure password hashes per second per core for each configured hasher."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3.0, help="Time spent on each hasher per worker.")
+        parser.add_argument('--workers', type=int, default=1, help="Parallel worker processes.")
+        parser.add_argument('--target', type=float, help="Login target (logins/second) to size cores for.")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.stdout.write(
+            f"{os.cpu_count()} CPUs, {workers} worker(s), preferred hasher: {settings.PASSWORD_HASH_PROFILE}"
+        )
+        with ProcessPoolExecutor(max_workers=workers, initializer=setup_worker) as pool:
+            for hasher in get_hashers():
+                try:
+                    if hasher.library:
+                        hasher._load_library()
+                except ValueError:
+                    self.stdout.write(f"{hasher.algorithm:<16} skipped (library not installed)")
+                    continue
+                rates = list(pool.map(_hash_rate, [hasher.algorithm] * workers, [options['seconds']] * workers))
+                per_core = sum(rates) / len(rates)
+                line = f"{hasher.algorithm:<16} {per_core:10.1f} hashes/s per core {sum(rates):10.1f} total"
+                if options['target']:
+                    line += f"  ~{options['target'] / per_core:.1f} cores for {options['target']:g} logins/s"
+                self.stdout.write(line)
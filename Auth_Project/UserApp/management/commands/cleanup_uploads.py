@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from UserApp.uploads import cleanup_abandoned
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that were never finalized."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=settings.CHUNKED_UPLOAD_EXPIRY_HOURS,
+            help="Remove sessions idle for longer than this many hours.",
+        )
+
+    def handle(self, *args, **options):
+        removed = cleanup_abandoned(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} abandoned uploads."))
@@ -0,0 +1,35 @@
+import csv
+import json
+from django.core.management.base import BaseCommand
+from UserApp.bulk_users import EXPORT_FIELDS, export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream every user and profile to CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', '-o', help="Output file; defaults to stdout.")
+        parser.add_argument(
+            '--password-hashes', action='store_true',
+            help="Include password hashes so the file can be re-imported with logins intact.",
+        )
+
+    def handle(self, *args, **options):
+        fields = EXPORT_FIELDS + (('password_hash',) if options['password_hashes'] else ())
+        out = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else self.stdout
+        count = 0
+        try:
+            if options['format'] == 'csv':
+                writer = csv.DictWriter(out, fieldnames=fields)
+                writer.writeheader()
+            for row in export_rows(password_hashes=options['password_hashes']):
+                if options['format'] == 'csv':
+                    writer.writerow(row)
+                else:
+                    out.write(json.dumps(row, default=str) + '\n')
+                count += 1
+        finally:
+            if options['output']:
+                out.close()
+        self.stderr.write(f"Exported {count} users.")
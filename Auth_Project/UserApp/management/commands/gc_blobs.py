@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from UserApp.storage import collect_garbage, dedup_stats, recount_references
+
+
+class Command(BaseCommand):
+    help = "Delete unreferenced upload blobs and report deduplication savings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted without deleting it.")
+        parser.add_argument('--recount', action='store_true', help="Rebuild reference counts from the file tables first.")
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            blobs = recount_references()
+            self.stdout.write(f"Recounted references for {blobs} blobs.")
+
+        files, size = collect_garbage(dry_run=options['dry_run'])
+        verb = "Would free" if options['dry_run'] else "Freed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {files} blobs ({filesizeformat(size)})."))
+
+        stats = dedup_stats()
+        self.stdout.write(
+            f"Stored {filesizeformat(stats['stored'])} for {filesizeformat(stats['referenced'])} of uploads; "
+            f"deduplication saves {filesizeformat(stats['saved'])}."
+        )
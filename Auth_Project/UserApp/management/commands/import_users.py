@@ -0,0 +1,54 @@
+import os
+import sys
+from contextlib import nullcontext
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from UserApp.bulk_users import hashing_pool, import_batch, read_rows
+from UserApp.utils import log_event
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users (and their profiles) from a CSV or JSONL file. Bad rows are "
+        "reported and skipped; the rest are inserted in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=settings.USER_IMPORT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Password hashing processes; 0 hashes in this process.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if path == '-' and not options['format']:
+            raise CommandError("--format is required when reading stdin.")
+
+        created = failed = 0
+        seen = set()
+        batch = []
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+            with stream, (hashing_pool(options['workers']) if options['workers'] else nullcontext()) as pool:
+                for entry in read_rows(stream, fmt):
+                    batch.append(entry)
+                    if len(batch) >= options['batch_size']:
+                        created, failed = self._run(batch, pool, seen, created, failed)
+                        batch = []
+                if batch:
+                    created, failed = self._run(batch, pool, seen, created, failed)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        if created:
+            log_event(None, 'users_imported', count=created, filename=os.path.basename(path))
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"Created {created} users, {failed} rows failed."))
+
+    def _run(self, batch, pool, seen, created, failed):
+        count, errors = import_batch(batch, pool, seen)
+        for line_number, message in errors:
+            self.stderr.write(f"line {line_number}: {message}")
+        self.stdout.write(f"... {created + count} created")
+        return created + count, failed + len(errors)
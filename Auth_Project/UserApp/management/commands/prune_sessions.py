@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired rows from django_session in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.SESSION_PRUNE_BATCH_SIZE,
+            help="Rows deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        # Small batches keep each DELETE short, so the table stays usable
+        # while a large backlog is being cleared.
+        now = timezone.now()
+        total = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            total += Session.objects.filter(session_key__in=keys).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} expired sessions."))
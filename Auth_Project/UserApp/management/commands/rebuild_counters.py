@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from UserApp.counters import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard counter table from the source tables."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} counter rows."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from UserApp.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents from files, categories and the activity log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} search documents."))
@@ -0,0 +1,26 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from UserApp.mailer import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email, once or continuously with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox.")
+        parser.add_argument('--batch-size', type=int, default=settings.MAIL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                sent = deliver_pending(options['batch_size'])
+                total += sent
+                if not sent:
+                    break
+            if total:
+                self.stdout.write(f"Sent {total} messages.")
+            if not options['loop']:
+                break
+            time.sleep(settings.MAIL_POLL_INTERVAL)
@@ -0,0 +1,166 @@
+import copy
+import time
+import whitenoise.middleware
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+from .models import Profile
+
+User = get_user_model()
+
+
+def user_key(user_id):
+    return f"userapp:user:{user_id}"
+
+
+def version_key(user_id):
+    return f"userapp:user-version:{user_id}"
+
+
+def cached_user(user_id):
+    """
+    Returns (user, session auth hash), the user with its profile joined in,
+    from the cache when the stored copy matches the user's current version.
+    One cache round trip on a hit, one query on a miss. A missing version
+    key (never set, or culled) is a miss.
+
+    The cached copy has its password hash left out: the field is deferred
+    on a hit, so reading it costs a query and save() leaves it alone.
+    """
+    entries = cache.get_many([user_key(user_id), version_key(user_id)])
+    version = entries.get(version_key(user_id))
+    entry = entries.get(user_key(user_id))
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1], entry[2]
+
+    user = User.objects.select_related('profile').filter(pk=user_id).first()
+    if user is None:
+        return None, None
+    auth_hash = user.get_session_auth_hash()
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(version_key(user_id), version, None):
+            # Invalidated meanwhile; cache on the next request instead.
+            return user, auth_hash
+    stored = copy.copy(user)
+    stored.__dict__.pop('password', None)
+    cache.set(user_key(user_id), (version, stored, auth_hash), settings.USER_CACHE_TIMEOUT)
+    return user, auth_hash
+
+
+def invalidate_cached_user(user_id):
+    key = version_key(user_id)
+    cache.set(key, time.time_ns(), None)
+    # As in permissions.invalidate_user: bump again once the writer's
+    # transaction commits, in case a reader cached the old row meanwhile.
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def get_profile(user):
+    """
+    The user's profile, created on first use. Uses the profile loaded with a
+    cached user instead of querying for it.
+    """
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        profile, _ = Profile.objects.get_or_create(user=user)
+        return profile
+
+
+def load_user(request):
+    """
+    Same checks as django.contrib.auth.get_user(), but the user comes from
+    cached_user(). Anything unusual (a password change, a rotated secret
+    key) is handed to get_user() so the session is verified or flushed
+    the standard way.
+    """
+    try:
+        user_id = User._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    user, auth_hash = cached_user(user_id)
+    if user is None or not user.is_active:
+        return AnonymousUser()
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(session_hash, auth_hash):
+        return auth.get_user(request)
+    return user
+
+
+class CachedUserMiddleware:
+    """
+    Replaces the request.user set by AuthenticationMiddleware (which must
+    come first) with one loaded lazily through cached_user(), and
+    request.auser() with its async counterpart. Works in both sync and async
+    middleware chains, so it does not force async views onto a thread.
+
+    Only enabled with a shared cache (REDIS_URL): invalidation is a cache
+    write, which a per-process LocMemCache would keep from other workers.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        return await self.get_response(request)
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: load_user(request))
+
+        async def auser():
+            if not hasattr(request, '_acached_user'):
+                request._acached_user = await sync_to_async(load_user)(request)
+            return request._acached_user
+
+        request.auser = auser
+
+
+class WhiteNoiseMiddleware(whitenoise.middleware.WhiteNoiseMiddleware):
+    """
+    WhiteNoise's middleware is sync-only, and a single sync middleware makes
+    Django run every request, async views included, on a thread. This one
+    only goes to a thread to send a static file.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:20
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_counters(apps, schema_editor):
+    Counter = apps.get_model('UserApp', 'Counter')
+    counted = {
+        'uploadedfile': (apps.get_model('UserApp', 'UploadedFile'), 'uploaded_at'),
+        'file': (apps.get_model('UserApp', 'File'), 'uploaded_at'),
+        'category': (apps.get_model('UserApp', 'Category'), None),
+        'user': (apps.get_model('UserApp', 'CustomUser'), 'date_joined'),
+    }
+    rows = []
+    for name, (model, stamp_field) in counted.items():
+        rows.append(Counter(name=name, day=None, value=model.objects.count()))
+        if stamp_field:
+            per_day = model.objects.annotate(day=TruncDate(stamp_field)).values_list('day').annotate(count=Count('pk')).order_by()
+            rows.extend(Counter(name=name, day=day, value=count) for day, count in per_day)
+    Counter.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0011_activitylog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('day', models.DateField(blank=True, null=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'day'), name='counter_name_day_uniq'), models.UniqueConstraint(condition=models.Q(('day__isnull', True)), fields=('name',), name='counter_name_total_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
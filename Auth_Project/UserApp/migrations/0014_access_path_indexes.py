@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:23
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_access(apps, schema_editor):
+    # Keep the newest row per (file, user) so the unique constraint can be added.
+    FileAccess = apps.get_model('UserApp', 'FileAccess')
+    duplicates = (
+        FileAccess.objects.values('file', 'user')
+        .annotate(rows=Count('id'), keep=Max('id'))
+        .filter(rows__gt=1)
+    )
+    for dup in duplicates:
+        FileAccess.objects.filter(file=dup['file'], user=dup['user']).exclude(id=dup['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0013_activitylog_created_at_default'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_access, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['-created_at', '-id'], name='activitylog_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email'], name='user_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'username'], name='user_role_username_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='file_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['uploader', '-uploaded_at', '-id'], name='file_uploader_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fileaccess',
+            index=models.Index(fields=['user', 'file'], name='fileaccess_user_file_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filecategorymapping',
+            index=models.Index(fields=['-assigned_at', '-id'], name='mapping_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(fields=['-uploaded_at'], name='uploadedfile_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='fileaccess',
+            constraint=models.UniqueConstraint(fields=('file', 'user'), name='fileaccess_file_user_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:28
+
+import UserApp.storage
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0015_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='file',
+            field=models.FileField(max_length=255, storage=UserApp.storage.content_storage, upload_to='uploads/'),
+        ),
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='file',
+            field=models.FileField(max_length=255, storage=UserApp.storage.content_storage, upload_to='uploads/'),
+        ),
+    ]
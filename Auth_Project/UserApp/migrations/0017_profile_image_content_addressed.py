@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+import UserApp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0016_content_addressed_files'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_image',
+            field=models.ImageField(blank=True, max_length=255, null=True, storage=UserApp.storage.content_storage, upload_to='profile_pics/'),
+        ),
+    ]
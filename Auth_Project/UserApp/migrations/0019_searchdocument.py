@@ -0,0 +1,106 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+FTS_TABLE = 'userapp_search_fts'
+DOCUMENT_TABLE = 'UserApp_searchdocument'
+
+# External-content FTS5 table: the text stays in SearchDocument and the
+# triggers keep the index in step with every insert, update and delete.
+# SQLite's schema editor rebuilds a table (dropping its triggers) on most
+# ALTERs, so a later migration touching SearchDocument must recreate them.
+SQLITE_CREATE = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body, content='{DOCUMENT_TABLE}', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON "{DOCUMENT_TABLE}" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON "{DOCUMENT_TABLE}" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON "{DOCUMENT_TABLE}" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _vector_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return GinIndex(SearchVector('title', 'body', config='english'), name='searchdoc_vector_idx')
+
+
+def create_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_CREATE:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('UserApp', 'SearchDocument'), _vector_index())
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('UserApp', 'SearchDocument'), _vector_index())
+
+
+def populate_documents(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    SearchDocument = apps.get_model('UserApp', 'SearchDocument')
+    sources = [
+        ('file', apps.get_model('UserApp', 'File').objects.using(db_alias),
+         lambda f: (f.title, f.description or '', f.uploaded_at)),
+        ('category', apps.get_model('UserApp', 'Category').objects.using(db_alias),
+         lambda c: (c.name, c.description, django.utils.timezone.now())),
+        ('activity', apps.get_model('UserApp', 'ActivityLog').objects.using(db_alias).select_related('user'),
+         lambda a: (a.user.username if a.user_id else 'Anonymous', a.action, a.created_at)),
+    ]
+    for kind, queryset, fields in sources:
+        batch = []
+        for instance in queryset.order_by('pk').iterator(chunk_size=2000):
+            title, body, created_at = fields(instance)
+            batch.append(SearchDocument(kind=kind, object_id=instance.pk, title=title, body=body, created_at=created_at))
+            if len(batch) >= 2000:
+                SearchDocument.objects.using(db_alias).bulk_create(batch)
+                batch = []
+        SearchDocument.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0018_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('file', 'File'), ('category', 'Category'), ('activity', 'Activity')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdoc_object_uniq')],
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
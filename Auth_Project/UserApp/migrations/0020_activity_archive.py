@@ -0,0 +1,97 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:50
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.db import migrations, models
+
+TABLE = 'UserApp_activitylog'
+NEW_TABLE = 'UserApp_activitylog_partitioned'
+SEQUENCE = 'UserApp_activitylog_pk_seq'
+# Months of empty partitions created ahead; archive_activity keeps adding them.
+MONTHS_AHEAD = 2
+
+
+def _month(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_activity_log(apps, schema_editor):
+    """
+    On PostgreSQL, rebuilds the activity log as a table partitioned by month
+    of created_at, plus a DEFAULT partition for anything outside the
+    created ranges. A partitioned table's primary key must include the
+    partition key, so it becomes (id, created_at); ids still come from one
+    sequence. Other backends keep the plain table.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLE}" IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN(created_at) FROM "{TABLE}"')
+        oldest = cursor.fetchone()[0]
+
+    now = django.utils.timezone.now()
+    statements = [
+        f'CREATE SEQUENCE "{SEQUENCE}"',
+        f"""CREATE TABLE "{NEW_TABLE}" (
+            "id" bigint NOT NULL DEFAULT nextval('"{SEQUENCE}"'),
+            "role" varchar(20) NOT NULL,
+            "action" text NOT NULL,
+            "created_at" timestamp with time zone NOT NULL,
+            "user_id" bigint NULL REFERENCES "UserApp_customuser" ("id") DEFERRABLE INITIALLY DEFERRED,
+            CONSTRAINT "{NEW_TABLE}_pkey" PRIMARY KEY ("id", "created_at")
+        ) PARTITION BY RANGE ("created_at")""",
+        f'CREATE INDEX "activitylog_partitioned_recent_idx" ON "{NEW_TABLE}" ("created_at" DESC, "id" DESC)',
+        f'CREATE INDEX "activitylog_partitioned_user_idx" ON "{NEW_TABLE}" ("user_id")',
+        f'CREATE TABLE "{TABLE}_default" PARTITION OF "{NEW_TABLE}" DEFAULT',
+    ]
+    month = _month(oldest or now)
+    last = _month(now)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        statements.append(
+            f'CREATE TABLE "{TABLE}_p{month:%Y%m}" PARTITION OF "{NEW_TABLE}" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        )
+        month = _next_month(month)
+    statements += [
+        f'INSERT INTO "{NEW_TABLE}" ("id", "role", "action", "created_at", "user_id") '
+        f'SELECT "id", "role", "action", "created_at", "user_id" FROM "{TABLE}"',
+        f"SELECT setval('\"{SEQUENCE}\"', COALESCE((SELECT MAX(\"id\") FROM \"{NEW_TABLE}\"), 0) + 1, false)",
+        f'DROP TABLE "{TABLE}"',
+        f'ALTER TABLE "{NEW_TABLE}" RENAME TO "{TABLE}"',
+        'ALTER INDEX "activitylog_partitioned_recent_idx" RENAME TO "activitylog_recent_idx"',
+        f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"',
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0019_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('path', models.CharField(max_length=255)),
+                ('rows', models.PositiveIntegerField()),
+                ('last_id', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        # The partitioned table matches the ActivityLog model exactly, so
+        # there is nothing to undo when migrating backwards.
+        migrations.RunPython(partition_activity_log, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:52
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The messages log_activity was called with before events existed, newest
+# wording first. Named groups become the event's data.
+PATTERNS = [
+    ('registered', r"Registered new user with role: (?P<role>\w+)"),
+    ('login', r"Logged in"),
+    ('logout', r"Logged out"),
+    ('password_reset', r"Password reset"),
+    ('profile_updated', r"Updated profile"),
+    ('login_locked', r"Login locked for (?P<subject>.+) for (?P<seconds>\d+)s after (?P<attempts>\d+) failed attempts"),
+    ('file_uploaded', r"Uploaded file: (?P<title>.*)"),
+    ('file_edited', r"Edited file: (?P<title>.*)"),
+    ('file_deleted', r"Deleted file: (?P<title>.*)"),
+    ('category_reassigned', r"Reassigned category '(?P<category>.*)' \((?P<files>\d+) files\) to (?P<users>\d+) users"),
+    ('assignment_deleted', r"Deleted assignment of file '(?P<title>.*)' to category '(?P<category>.*)'"),
+    ('user_deleted', r"Deleted user: (?P<username>.*)"),
+    ('users_imported', r"Imported (?P<count>\d+) users from (?P<filename>.*)"),
+]
+PATTERNS = [(event, re.compile(pattern)) for event, pattern in PATTERNS]
+# Events whose target can be found again by name, when the name is unique.
+TARGETS = {
+    'file_uploaded': ('file', 'title', 'title'),
+    'file_edited': ('file', 'title', 'title'),
+    'assignment_deleted': ('file', 'title', 'title'),
+    'category_reassigned': ('category', 'name', 'category'),
+}
+NUMERIC = {'seconds', 'attempts', 'files', 'users', 'count'}
+BATCH_SIZE = 2000
+
+
+def _parse(action):
+    for event, pattern in PATTERNS:
+        match = pattern.fullmatch(action)
+        if match:
+            data = {key: int(value) if key in NUMERIC else value for key, value in match.groupdict().items()}
+            return event, data
+    return 'other', {}
+
+
+def parse_actions(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    ActivityLog = apps.get_model('UserApp', 'ActivityLog')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    models_by_name = {'file': apps.get_model('UserApp', 'File'), 'category': apps.get_model('UserApp', 'Category')}
+    content_types = {
+        name: ContentType.objects.db_manager(db_alias).get_or_create(app_label='UserApp', model=name)[0]
+        for name in models_by_name
+    }
+    resolved = {}
+
+    def target_for(event, data):
+        if event not in TARGETS:
+            return None, None
+        name, field, key = TARGETS[event]
+        lookup = (name, data[key])
+        if lookup not in resolved:
+            ids = list(models_by_name[name].objects.using(db_alias).filter(**{field: data[key]}).values_list('id', flat=True)[:2])
+            resolved[lookup] = ids[0] if len(ids) == 1 else None
+        if resolved[lookup] is None:
+            return None, None
+        return content_types[name], resolved[lookup]
+
+    last_id = 0
+    while True:
+        batch = list(ActivityLog.objects.using(db_alias).filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            break
+        for entry in batch:
+            entry.event, entry.data = _parse(entry.action)
+            entry.target_type, entry.target_id = target_for(entry.event, entry.data)
+        ActivityLog.objects.using(db_alias).bulk_update(batch, ['event', 'data', 'target_type', 'target_id'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserApp', '0020_activity_archive'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='data',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='event',
+            field=models.CharField(choices=[('registered', 'Registered'), ('login', 'Logged in'), ('logout', 'Logged out'), ('login_locked', 'Login locked'), ('password_reset', 'Password reset'), ('profile_updated', 'Profile updated'), ('file_uploaded', 'File uploaded'), ('file_edited', 'File edited'), ('file_deleted', 'File deleted'), ('category_reassigned', 'Category reassigned'), ('assignment_deleted', 'Assignment deleted'), ('user_deleted', 'User deleted'), ('users_imported', 'Users imported'), ('other', 'Other')], default='other', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='target_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='target_type',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contenttypes.contenttype'),
+        ),
+        # Before the indexes, so the backfill does not have to maintain them.
+        migrations.RunPython(parse_actions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='activitylog_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['event', '-created_at', '-id'], name='activitylog_event_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['target_type', 'target_id', '-created_at', '-id'], name='activitylog_target_recent_idx'),
+        ),
+    ]
@@ -1,7 +1,11 @@
+import uuid
 from django.contrib.auth.models import AbstractUser
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+from .storage import content_storage
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -11,6 +15,12 @@ class CustomUser(AbstractUser):
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='employee')
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['email'], name='user_email_idx'),
+            models.Index(fields=['role', 'username'], name='user_role_username_idx'),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -24,7 +34,7 @@ class Profile(models.Model):
     country = models.CharField(max_length=50, blank=True)
     city = models.CharField(max_length=50, blank=True)
     postalcode = models.CharField(max_length=50, blank=True)
-    profile_image = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_image = models.ImageField(upload_to='profile_pics/', storage=content_storage, max_length=255, blank=True, null=True)
 
     def __str__(self):
         return self.user.username
@@ -38,11 +48,16 @@ class Category(models.Model):
 
 class UploadedFile(models.Model):
     name = models.CharField(max_length=255)
-    file = models.FileField(upload_to='uploads/')
+    file = models.FileField(upload_to='uploads/', storage=content_storage, max_length=255)
     category = models.ForeignKey(Category, related_name='files', on_delete=models.SET_NULL, null=True, blank=True)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-uploaded_at'], name='uploadedfile_recent_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -50,7 +65,7 @@ class File(models.Model):
     uploader = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    file = models.FileField(upload_to='uploads/')
+    file = models.FileField(upload_to='uploads/', storage=content_storage, max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(null=True, blank=True)
     updated_by = models.ForeignKey(
@@ -61,6 +76,12 @@ class File(models.Model):
         related_name='file_updates'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-uploaded_at', '-id'], name='file_recent_idx'),
+            models.Index(fields=['uploader', '-uploaded_at', '-id'], name='file_uploader_recent_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
@@ -99,6 +120,11 @@ class FileCategoryMapping(models.Model):
     )
     reassigned_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-assigned_at', '-id'], name='mapping_recent_idx'),
+        ]
+
     def __str__(self):
         assigned_user = self.assigned_to.username if self.assigned_to else 'Unassigned'
         return f"{self.file.title} - {self.category.name} → {assigned_user}"
@@ -109,15 +135,183 @@ class FileAccess(models.Model):
     can_view = models.BooleanField(default=True)
     can_edit = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['file', 'user'], name='fileaccess_file_user_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'file'], name='fileaccess_user_file_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} access to {self.file.title}"
 
 class ActivityLog(models.Model):
+    EVENT_CHOICES = (
+        ('registered', 'Registered'),
+        ('login', 'Logged in'),
+        ('logout', 'Logged out'),
+        ('login_locked', 'Login locked'),
+        ('password_reset', 'Password reset'),
+        ('profile_updated', 'Profile updated'),
+        ('file_uploaded', 'File uploaded'),
+        ('file_edited', 'File edited'),
+        ('file_deleted', 'File deleted'),
+        ('category_reassigned', 'Category reassigned'),
+        ('assignment_deleted', 'Assignment deleted'),
+        ('user_deleted', 'User deleted'),
+        ('users_imported', 'Users imported'),
+        ('other', 'Other'),
+    )
+    # How `action` is rendered from `data` for each event (see utils.log_event).
+    EVENT_MESSAGES = {
+        'registered': "Registered new user with role: {role}",
+        'login': "Logged in",
+        'logout': "Logged out",
+        'login_locked': "Login locked for {subject} for {seconds}s after {attempts} failed attempts",
+        'password_reset': "Password reset",
+        'profile_updated': "Updated profile",
+        'file_uploaded': "Uploaded file: {title}",
+        'file_edited': "Edited file: {title}",
+        'file_deleted': "Deleted file: {title}",
+        'category_reassigned': "Reassigned category '{category}' ({files} files) to {users} users",
+        'assignment_deleted': "Deleted assignment of file '{title}' to category '{category}'",
+        'user_deleted': "Deleted user: {username}",
+        'users_imported': "Imported {count} users from {filename}",
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     role = models.CharField(max_length=20, blank=True)
+    event = models.CharField(max_length=30, choices=EVENT_CHOICES, default='other')
+    # Indexed together with target_id below.
+    target_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='+', db_index=False)
+    target_id = models.PositiveBigIntegerField(null=True, blank=True)
+    target = GenericForeignKey('target_type', 'target_id')
+    data = models.JSONField(default=dict, blank=True)
     action = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='activitylog_recent_idx'),
+            # One per activity_log_view filter, each ending in the page order.
+            models.Index(fields=['user', '-created_at', '-id'], name='activitylog_user_recent_idx'),
+            models.Index(fields=['event', '-created_at', '-id'], name='activitylog_event_recent_idx'),
+            models.Index(fields=['target_type', 'target_id', '-created_at', '-id'], name='activitylog_target_recent_idx'),
+        ]
 
     def __str__(self):
         username = self.user.username if self.user else "Anonymous"
         return f"{username} ({self.role}) - {self.action[:30]}"
+
+class ActivityArchive(models.Model):
+    """
+    A gzipped JSONL file of ActivityLog rows from one month, written by
+    `manage.py archive_activity` before the rows were removed. A month can
+    have several parts if entries arrived after it was first archived.
+    """
+    month = models.DateField()
+    path = models.CharField(max_length=255)
+    rows = models.PositiveIntegerField()
+    last_id = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.rows} rows in {self.path}"
+
+class Counter(models.Model):
+    name = models.CharField(max_length=50)
+    day = models.DateField(null=True, blank=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'day'], name='counter_name_day_uniq'),
+            models.UniqueConstraint(fields=['name'], condition=models.Q(day__isnull=True), name='counter_name_total_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.day or 'total'} = {self.value}"
+
+class ChunkedUpload(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads')
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    file = models.ForeignKey('File', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['completed_at', 'updated_at'], name='chunkedupload_stale_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+class Blob(models.Model):
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.refcount} refs)"
+
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.to} ({self.status})"
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable row per File, Category and ActivityLog entry, kept in
+    sync by UserApp.signals. The full-text index over it is backend
+    specific (see UserApp.search).
+    """
+    KIND_CHOICES = (
+        ('file', 'File'),
+        ('category', 'Category'),
+        ('activity', 'Activity'),
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchdoc_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
@@ -0,0 +1,90 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+from .ratelimit import atake_token
+from .utils import generate_email_otp
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def _key(email):
+    return f"userapp:otp:{salted_hmac('otp-key', email).hexdigest()}"
+
+
+def _digest(email, code):
+    return salted_hmac('otp-code', f"{email}:{code}").hexdigest()
+
+
+def _record(email, code):
+    # (digest, wrong attempts, expiry as a unix time)
+    return _digest(email, code), 0, time.time() + settings.OTP_TTL
+
+
+def _remaining(record):
+    # Rewrites keep the code's original expiry rather than restarting OTP_TTL.
+    return max(1, int(record[2] - time.time()))
+
+
+async def acan_send(email, ip):
+    email_limit = settings.OTP_RATE_LIMITS['send_email']
+    ip_limit = settings.OTP_RATE_LIMITS['send_ip']
+    return (
+        await atake_token('otp-send-ip', ip, *ip_limit)
+        and await atake_token('otp-send-email', _key(email), *email_limit)
+    )
+
+
+async def acan_verify(ip):
+    return await atake_token('otp-verify-ip', ip, *settings.OTP_RATE_LIMITS['verify_ip'])
+
+
+async def aissue(email):
+    """
+    Creates a new code for `email`, replacing any earlier one, and returns
+    it. Only a keyed hash is stored, in the cache, for OTP_TTL seconds.
+    """
+    code = generate_email_otp()
+    await cache.aset(_key(email), _record(email, code), settings.OTP_TTL)
+    return code
+
+
+def _evaluate(record, email, code):
+    """
+    Returns (result, record to store); a None record means delete it.
+    """
+    if record is None:
+        return EXPIRED, None
+    digest, attempts, expires_at = record
+    if expires_at <= time.time():
+        return EXPIRED, None
+    if constant_time_compare(digest, _digest(email, code)):
+        return VERIFIED, None
+    attempts += 1
+    if attempts >= settings.OTP_MAX_ATTEMPTS:
+        return LOCKED, None
+    return INVALID, (digest, attempts, expires_at)
+
+
+async def acheck(email, code):
+    """
+    Verifies `code` with a single cache read. A wrong code costs one cache
+    write to bump the attempt counter, which keeps the code's original
+    expiry; after OTP_MAX_ATTEMPTS the code is discarded and a new one must
+    be requested.
+    """
+    key = _key(email)
+    record = await cache.aget(key)
+    result, updated = _evaluate(record, email, code)
+    if updated is not None:
+        await cache.aset(key, updated, _remaining(updated))
+    elif record is not None:
+        await cache.adelete(key)
+    return result
@@ -0,0 +1,141 @@
+import base64
+import binascii
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder trims datetimes to milliseconds; keyset comparisons
+    # need the exact stored value.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode('n', self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode('p', self.object_list[0])
+        return None
+
+
+class CursorPaginator:
+    """
+    Keyset paginator. `ordering` must end in a unique field (normally the
+    primary key), e.g. ('-created_at', '-id'). Pages are fetched with a
+    WHERE on the last row seen instead of COUNT(*) + OFFSET, so every page
+    costs the same no matter how deep it is. Cursors are opaque,
+    URL-safe tokens.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.per_page = per_page
+
+    def get_page(self, cursor=None, page_number=None):
+        position = self.decode(cursor) if cursor else None
+        if position is None and page_number:
+            return self._offset_page(page_number)
+        if position is None:
+            rows = list(self.queryset[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        direction, values = position
+        if direction == 'n':
+            rows = list(self.queryset.filter(self._after(values, forward=True))[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        reverse = [('' if desc else '-') + name for name, desc in self.ordering]
+        rows = list(self.queryset.order_by(*reverse).filter(self._after(values, forward=False))[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, True, has_previous)
+
+    def get_page_from_request(self, request):
+        """
+        Reads ?cursor=, falling back to the old ?page=N links.
+        """
+        return self.get_page(request.GET.get('cursor'), request.GET.get('page'))
+
+    def encode(self, direction, obj):
+        values = [getattr(obj, name) for name, _ in self.ordering]
+        raw = json.dumps([direction, values], cls=CursorEncoder).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('n', 'p') or len(values) != len(self.ordering):
+                return None
+            values = [self._to_python(name, value) for (name, _), value in zip(self.ordering, values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return None
+        return direction, values
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation such as a search rank; JSON keeps numbers as-is.
+            if not isinstance(value, (int, float)):
+                raise ValueError(name)
+            return value
+        return field.to_python(value)
+
+    def _after(self, values, forward):
+        """
+        Rows strictly after `values` in the requested direction, written as
+        (a < x) OR (a = x AND b < y) so it can use a composite index.
+        """
+        condition = Q()
+        for i, (name, desc) in enumerate(self.ordering):
+            lookup = 'lt' if desc == forward else 'gt'
+            term = Q(**{f"{name}__{lookup}": values[i]})
+            for j, (prev_name, _) in enumerate(self.ordering[:i]):
+                term &= Q(**{prev_name: values[j]})
+            condition |= term
+        return condition
+
+    def _offset_page(self, page_number):
+        try:
+            number = max(int(page_number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        start = (number - 1) * self.per_page
+        rows = list(self.queryset[start:start + self.per_page + 1])
+        return CursorPage(rows[:self.per_page], self, len(rows) > self.per_page, number > 1)
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from .models import File, FileAccess
+
+User = get_user_model()
+
+EMPLOYEES_KEY = "userapp:perms:employees"
+
+
+def user_key(user_id):
+    return f"userapp:perms:user:{user_id}"
+
+
+def accessible_file_ids(user):
+    """
+    Ids of files shared with `user` through FileAccess, cached per user for
+    can_view; querysets use a subquery instead (see visible_files).
+    """
+    key = user_key(user.pk)
+    file_ids = cache.get(key)
+    if file_ids is None:
+        file_ids = frozenset(
+            FileAccess.objects.filter(user_id=user.pk, can_view=True).values_list('file_id', flat=True)
+        )
+        cache.set(key, file_ids, settings.PERMISSION_CACHE_TIMEOUT)
+    return file_ids
+
+
+def employee_ids():
+    """
+    Ids of users with the employee role; managers may view their uploads.
+    """
+    ids = cache.get(EMPLOYEES_KEY)
+    if ids is None:
+        ids = frozenset(User.objects.filter(role='employee').values_list('id', flat=True))
+        cache.set(EMPLOYEES_KEY, ids, settings.PERMISSION_CACHE_TIMEOUT)
+    return ids
+
+
+def can_view(user, file):
+    """
+    Whether `user` may see `file`: admins see everything, everyone sees their
+    own uploads and files shared with them, and managers also see what
+    employees upload. Answered from the cache once it is warm.
+    """
+    if not user.is_authenticated:
+        return False
+    if user.role == 'admin' or file.uploader_id == user.pk:
+        return True
+    if user.role == 'manager' and file.uploader_id in employee_ids():
+        return True
+    return file.pk in accessible_file_ids(user)
+
+
+def visible_files(user):
+    """
+    Queryset of every File `user` may see, using the same rules as can_view.
+    Grants are a subquery rather than the cached id set, so the SQL does not
+    grow with the number of files shared with the user.
+    """
+    if not user.is_authenticated:
+        return File.objects.none()
+    if user.role == 'admin':
+        return File.objects.all()
+
+    shared = FileAccess.objects.filter(user_id=user.pk, can_view=True).values('file_id')
+    condition = Q(uploader=user) | Q(id__in=shared)
+    if user.role == 'manager':
+        condition |= Q(uploader__role='employee')
+    return File.objects.filter(condition)
+
+
+def invalidate_user(*user_ids):
+    keys = [user_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # A concurrent reader may re-cache the old rows before the writer's
+    # transaction commits, so drop the keys again once it has.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_roles():
+    cache.delete(EMPLOYEES_KEY)
+    transaction.on_commit(lambda: cache.delete(EMPLOYEES_KEY))
@@ -0,0 +1,86 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Category, FileCategoryMapping, FileAccess, UploadedFile
+from .pagination import CursorPaginator
+
+ASSIGNMENTS_PER_PAGE = 20
+
+
+def assignment_queryset():
+    """
+    Assignments with everything category_list.html touches loaded up front,
+    so rendering a page costs the same number of queries for 5 or 5000 rows.
+    """
+    accesses = FileAccess.objects.select_related('user').order_by('user__username')
+    return (
+        FileCategoryMapping.objects
+        .select_related('file', 'category', 'assigned_by', 'reassigned_by')
+        .prefetch_related(Prefetch('file__fileaccess_set', queryset=accesses))
+    )
+
+
+def assignment_page(request, per_page=ASSIGNMENTS_PER_PAGE):
+    paginator = CursorPaginator(assignment_queryset(), ('-assigned_at', '-id'), per_page)
+    return paginator.get_page_from_request(request)
+
+
+CHART_WINDOWS = (7, 30, 90)
+
+
+def chart_cache_key(days):
+    return f"userapp:chart_data:{days}"
+
+
+def _chart_queries(days):
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    since = timezone.make_aware(datetime.combine(start, time.min))
+
+    per_day = (
+        UploadedFile.objects
+        .filter(uploaded_at__gte=since)
+        .annotate(day=TruncDate('uploaded_at'))
+        .values('day')
+        .annotate(count=Count('id'))
+        .values_list('day', 'count')
+    )
+    dates = [start + timedelta(days=i) for i in range(days)]
+    categories = Category.objects.annotate(count=Count('files')).order_by('name').values_list('name', 'count')
+    return dates, per_day, categories
+
+
+def _chart_payload(dates, per_day, categories):
+    return {
+        "upload_dates": [d.strftime("%b %d") for d in dates],
+        "upload_counts": [per_day.get(d, 0) for d in dates],
+        "category_names": [name for name, _ in categories],
+        "category_counts": [count for _, count in categories],
+    }
+
+
+async def aupload_chart_data(days):
+    """
+    Per-day upload counts for the last `days` days plus per-category totals.
+    Each series is a single GROUP BY, whatever the window size.
+    """
+    dates, per_day, categories = _chart_queries(days)
+    per_day = {day: count async for day, count in per_day}
+    categories = [row async for row in categories]
+    return _chart_payload(dates, per_day, categories)
+
+
+async def acached_upload_chart_data(days):
+    key = chart_cache_key(days)
+    data = await cache.aget(key)
+    if data is None:
+        data = await aupload_chart_data(days)
+        await cache.aset(key, data, settings.CHART_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_chart_data():
+    cache.delete_many([chart_cache_key(days) for days in CHART_WINDOWS])
@@ -0,0 +1,52 @@
+import time
+from django.core.cache import cache
+
+
+def _bucket_key(scope, identity):
+    return f"userapp:rl:{scope}:{identity}"
+
+
+def _spend(state, capacity, refill_seconds):
+    """
+    Refills a (tokens, timestamp) bucket and takes one token if it can.
+    Returns (allowed, new state).
+    """
+    now = time.time()
+    tokens, stamp = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) / refill_seconds)
+    if tokens < 1:
+        return False, (tokens, now)
+    return True, (tokens - 1, now)
+
+
+async def atake_token(scope, identity, capacity, refill_seconds):
+    """
+    Token bucket kept in the cache: `capacity` requests in a burst, one more
+    every `refill_seconds`. Returns False when the bucket is empty. The
+    read-modify-write is not atomic across processes, so a burst racing
+    between workers may get a token or two extra.
+    """
+    key = _bucket_key(scope, identity)
+    allowed, state = _spend(await cache.aget(key), capacity, refill_seconds)
+    await cache.aset(key, state, int(capacity * refill_seconds) + 1)
+    return allowed
+
+
+def sliding_window(scope, identity, window_seconds, hit=True):
+    """
+    Sliding-window log: the number of hits for `identity` in the last
+    `window_seconds`, counting this one when `hit` is set. Timestamps are
+    kept in a single cache entry, so the same caveat about concurrent
+    writers as atake_token applies.
+    """
+    key = _bucket_key(scope, identity)
+    now = time.time()
+    hits = [stamp for stamp in cache.get(key, ()) if stamp > now - window_seconds]
+    if hit:
+        hits.append(now)
+        cache.set(key, hits, int(window_seconds) + 1)
+    return len(hits)
+
+
+def clear(scope, identity):
+    cache.delete(_bucket_key(scope, identity))
@@ -0,0 +1,122 @@
+import re
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.urls import reverse
+from .models import ActivityLog, Category, File, SearchDocument
+from .permissions import visible_files
+
+# SQLite FTS5 table over SearchDocument, created by migration 0019.
+FTS_TABLE = 'userapp_search_fts'
+# PostgreSQL text search configuration; must match the GIN index in 0019.
+SEARCH_CONFIG = 'english'
+SEARCH_RESULTS_PER_PAGE = 20
+
+KINDS = {File: 'file', Category: 'category', ActivityLog: 'activity'}
+TERM_RE = re.compile(r'\w+')
+
+
+def document_for(instance):
+    kind = KINDS[type(instance)]
+    if kind == 'file':
+        return SearchDocument(kind=kind, object_id=instance.pk, title=instance.title,
+                              body=instance.description or '', created_at=instance.uploaded_at)
+    if kind == 'category':
+        return SearchDocument(kind=kind, object_id=instance.pk, title=instance.name, body=instance.description)
+    username = instance.user.username if instance.user_id else 'Anonymous'
+    return SearchDocument(kind=kind, object_id=instance.pk, title=username,
+                          body=instance.action, created_at=instance.created_at)
+
+
+def index(instances):
+    """
+    Adds or refreshes the search documents for `instances` (all of one of
+    the KINDS models) with a single upsert.
+    """
+    documents = [document_for(instance) for instance in instances if instance.pk is not None]
+    SearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['title', 'body'],
+        batch_size=500,
+    )
+
+
+def unindex(instance):
+    SearchDocument.objects.filter(kind=KINDS[type(instance)], object_id=instance.pk).delete()
+
+
+def rebuild(batch_size=2000):
+    """
+    Recreates every search document from the source tables. Needed after
+    bulk writes or raw SQL, which bypass the signal handlers.
+    """
+    SearchDocument.objects.all().delete()
+    total = 0
+    sources = [File.objects.all(), Category.objects.all(), ActivityLog.objects.select_related('user')]
+    for queryset in sources:
+        batch = []
+        for instance in queryset.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                index(batch)
+                total += len(batch)
+                batch = []
+        index(batch)
+        total += len(batch)
+    return total
+
+
+def visible_documents(user):
+    """
+    Documents `user` may see: files per permissions.visible_files,
+    categories for managers and admins, the activity log for admins.
+    """
+    if not user.is_authenticated:
+        return SearchDocument.objects.none()
+    if user.role == 'admin':
+        return SearchDocument.objects.all()
+    condition = Q(kind='file', object_id__in=visible_files(user).values('id'))
+    if user.role == 'manager':
+        condition |= Q(kind='category')
+    return SearchDocument.objects.filter(condition)
+
+
+def search(user, query):
+    """
+    The documents `user` may see that match every word of `query` (as a
+    prefix), annotated with `rank`, where higher is better. Runs on the GIN
+    index under PostgreSQL and on the FTS5 table under SQLite.
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return SearchDocument.objects.none().annotate(rank=Value(0.0, output_field=FloatField()))
+    documents = visible_documents(user)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector('title', 'body', config=SEARCH_CONFIG)
+        text_query = SearchQuery(' & '.join(f"{term}:*" for term in terms), search_type='raw', config=SEARCH_CONFIG)
+        # ts_rank returns real (float4), which does not round-trip through
+        # the cursor's Python float; rank as double precision instead.
+        rank = Cast(SearchRank(vector, text_query), FloatField())
+        return documents.alias(vector=vector).filter(vector=text_query).annotate(rank=rank)
+
+    table = SearchDocument._meta.db_table
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return documents.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE} MATCH %s', f'{FTS_TABLE}.rowid = "{table}"."id"'],
+        params=[match],
+    ).annotate(rank=RawSQL(f'-bm25({FTS_TABLE})', []))
+
+
+def result_url(document):
+    if document.kind == 'file':
+        return reverse('file_download', args=[document.object_id])
+    if document.kind == 'category':
+        return reverse('category_list')
+    return reverse('activity_log')
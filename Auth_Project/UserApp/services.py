@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import FileAccess, FileCategoryMapping
+from .permissions import invalidate_user
+
+
+def set_file_access(files, user_ids, replace=True):
+    """
+    Gives every user in `user_ids` view access to every file in `files`
+    (instances or ids). With `replace`, access rows for anyone else on those
+    files are removed. Runs as one bulk INSERT plus one DELETE inside a
+    single transaction and returns (added, removed).
+    """
+    file_ids = {getattr(f, 'pk', f) for f in files}
+    desired = {int(uid) for uid in user_ids}
+    if not file_ids:
+        return 0, 0
+
+    with transaction.atomic():
+        current = set(
+            FileAccess.objects.filter(file_id__in=file_ids).values_list('file_id', 'user_id')
+        )
+        missing = [
+            FileAccess(file_id=file_id, user_id=user_id, can_view=True, can_edit=False)
+            for file_id in file_ids
+            for user_id in desired
+            if (file_id, user_id) not in current
+        ]
+        FileAccess.objects.bulk_create(missing, ignore_conflicts=True)
+        # bulk_create sends no post_save, so refresh the cached permission
+        # sets here; the delete below goes through the post_delete signal.
+        if missing:
+            invalidate_user(*desired)
+
+        removed = 0
+        if replace and any(user_id not in desired for _, user_id in current):
+            removed, _ = FileAccess.objects.filter(file_id__in=file_ids).exclude(user_id__in=desired).delete()
+
+    return len(missing), removed
+
+
+def reassign_category(category, user_ids, reassigned_by):
+    """
+    Hands every file assigned to `category` over to `user_ids` in one
+    request, replacing whoever had access before.
+    """
+    mappings = FileCategoryMapping.objects.filter(category=category)
+    with transaction.atomic():
+        file_ids = set(mappings.values_list('file_id', flat=True))
+        result = set_file_access(file_ids, user_ids, replace=True)
+        mappings.update(reassigned_by=reassigned_by, reassigned_at=timezone.now())
+    return len(file_ids), result
@@ -0,0 +1,96 @@
+from importlib import import_module
+from django.conf import settings
+from django.core import signing
+
+SIGNED_SALT = 'UserApp.sessions'
+
+ServerSessionStore = import_module(settings.SESSION_SERVER_ENGINE).SessionStore
+
+
+class SessionStore(ServerSessionStore):
+    """
+    Anonymous sessions (the OTP/registration state) live in a signed cookie
+    and never touch the database; as soon as a user is logged in the session
+    moves to SESSION_SERVER_ENGINE. Signed cookie values always contain ':',
+    which server-side session keys never do, so the two can share a cookie.
+    """
+
+    @staticmethod
+    def _is_signed(session_key):
+        return bool(session_key) and ':' in session_key
+
+    @staticmethod
+    def _is_anonymous(data):
+        return '_auth_user_id' not in data
+
+    def _load_signed(self):
+        try:
+            return signing.loads(
+                self.session_key,
+                serializer=self.serializer,
+                max_age=self.get_session_cookie_age(),
+                salt=SIGNED_SALT,
+            )
+        except Exception:
+            # Tampered or expired: start over, as the other backends do.
+            self._session_key = None
+            return {}
+
+    def _save_signed(self, data):
+        self._session_key = signing.dumps(data, compress=True, salt=SIGNED_SALT, serializer=self.serializer)
+        self.modified = True
+
+    def load(self):
+        if not self._is_signed(self.session_key):
+            return super().load()
+        return self._load_signed()
+
+    async def aload(self):
+        if not self._is_signed(self.session_key):
+            return await super().aload()
+        return self._load_signed()
+
+    def save(self, must_create=False):
+        if self._is_anonymous(self._session):
+            return self._save_signed(self._session)
+        if self._is_signed(self._session_key):
+            # First save after login: promote to a server-side session.
+            self._session_key = None
+        super().save(must_create=must_create)
+
+    async def asave(self, must_create=False):
+        data = await self._aget_session()
+        if self._is_anonymous(data):
+            return self._save_signed(data)
+        if self._is_signed(self._session_key):
+            self._session_key = None
+        await super().asave(must_create=must_create)
+
+    def exists(self, session_key):
+        if self._is_signed(session_key):
+            return False
+        return super().exists(session_key)
+
+    async def aexists(self, session_key):
+        if self._is_signed(session_key):
+            return False
+        return await super().aexists(session_key)
+
+    def _forget_signed(self, session_key):
+        if session_key is None:
+            session_key = self.session_key
+        if not self._is_signed(session_key):
+            return session_key
+        if session_key == self.session_key:
+            self._session_key = None
+        return None
+
+    def delete(self, session_key=None):
+        session_key = self._forget_signed(session_key)
+        if session_key is not None:
+            super().delete(session_key)
+
+    async def adelete(self, session_key=None):
+        session_key = self._forget_signed(session_key)
+        if session_key is not None:
+            await super().adelete(session_key)
@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .counters import record
+from .middleware import invalidate_cached_user
+from .models import ActivityLog, Category, File, FileAccess, Profile, UploadedFile
+from .permissions import invalidate_roles, invalidate_user
+from .queries import invalidate_chart_data
+from .search import index as index_for_search, unindex as unindex_for_search
+from .storage import add_reference
+from .thumbnails import schedule as schedule_thumbnail
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=UploadedFile)
+@receiver(post_delete, sender=UploadedFile)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_chart_data(sender, **kwargs):
+    invalidate_chart_data()
+
+
+@receiver(post_save, sender=UploadedFile)
+@receiver(post_save, sender=File)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=User)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record(instance, 1)
+
+
+@receiver(post_delete, sender=UploadedFile)
+@receiver(post_delete, sender=File)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=User)
+def count_deleted(sender, instance, **kwargs):
+    record(instance, -1)
+
+
+@receiver(post_save, sender=FileAccess)
+@receiver(post_delete, sender=FileAccess)
+def refresh_file_permissions(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def refresh_role_permissions(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'role' not in update_fields:
+        return
+    invalidate_user(instance.pk)
+    invalidate_roles()
+
+
+@receiver(post_delete, sender=User)
+def drop_user_permissions(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    invalidate_roles()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def refresh_cached_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def refresh_cached_profile(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(post_save, sender=File)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=ActivityLog)
+def refresh_search_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_for_search([instance])
+
+
+@receiver(post_delete, sender=File)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=ActivityLog)
+def drop_search_document(sender, instance, **kwargs):
+    unindex_for_search(instance)
+
+
+BLOB_FIELDS = {File: 'file', UploadedFile: 'file', Profile: 'profile_image'}
+THUMBNAIL_VARIANTS = {File: 'preview', UploadedFile: 'preview', Profile: 'avatar'}
+
+
+def _stored_name(instance):
+    # Read the raw attribute so deferred file fields are not loaded.
+    value = instance.__dict__.get(BLOB_FIELDS[type(instance)])
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=File)
+@receiver(post_init, sender=UploadedFile)
+@receiver(post_init, sender=Profile)
+def remember_stored_file(sender, instance, **kwargs):
+    instance._stored_file_name = _stored_name(instance)
+
+
+@receiver(post_save, sender=File)
+@receiver(post_save, sender=UploadedFile)
+@receiver(post_save, sender=Profile)
+def track_blob_references(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stored_file_name', '')
+    current = _stored_name(instance)
+    if current != previous:
+        add_reference(current, 1)
+        add_reference(previous, -1)
+        instance._stored_file_name = current
+        schedule_thumbnail(getattr(instance, BLOB_FIELDS[sender]), THUMBNAIL_VARIANTS[sender])
+
+
+@receiver(post_delete, sender=File)
+@receiver(post_delete, sender=UploadedFile)
+@receiver(post_delete, sender=Profile)
+def release_blob_reference(sender, instance, **kwargs):
+    add_reference(_stored_name(instance), -1)
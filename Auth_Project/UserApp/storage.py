@@ -0,0 +1,234 @@
+import hashlib
+import os
+import tempfile
+import time
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CAS_PREFIX = 'cas/'
+BLOB_DIR = 'blobs'
+MAX_BASENAME = 150
+
+
+def blob_hash(name):
+    """
+    The SHA-256 embedded in a content-addressed name, or None for files
+    stored before content addressing.
+    """
+    if not name or not name.startswith(CAS_PREFIX):
+        return None
+    digest = name[len(CAS_PREFIX):].split('/', 1)[0]
+    return digest if len(digest) == 64 else None
+
+
+def blob_relative_path(digest):
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each distinct file body once under blobs/<aa>/<sha256>. Saved
+    names look like cas/<sha256>/<original name>, so every row keeps its
+    own filename while identical uploads share one blob on disk. Names
+    without the cas/ prefix are read from their old locations.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def path(self, name):
+        digest = blob_hash(name)
+        if digest:
+            return self.blob_path(digest)
+        return super().path(name)
+
+    def blob_path(self, digest):
+        return super().path(blob_relative_path(digest))
+
+    def blob_root(self):
+        return super().path(BLOB_DIR)
+
+    def url(self, name):
+        digest = blob_hash(name)
+        return super().url(blob_relative_path(digest) if digest else name)
+
+    def _save(self, name, content):
+        blob_root = self.blob_root()
+        os.makedirs(blob_root, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        handle, temp_path = tempfile.mkstemp(dir=blob_root, prefix='.incoming-')
+        try:
+            with os.fdopen(handle, 'wb') as temp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    temp.write(chunk)
+
+            digest = hasher.hexdigest()
+            target = self.blob_path(digest)
+            try:
+                # Reusing a blob restarts its grace period: the row that will
+                # reference it is not committed yet, and until post_save bumps
+                # the refcount, collect_garbage only sees a recent mtime.
+                os.utime(target)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(temp_path, target)
+                if self.file_permissions_mode is not None:
+                    os.chmod(target, self.file_permissions_mode)
+            else:
+                os.remove(temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        base, ext = os.path.splitext(os.path.basename(name))
+        basename = base[:MAX_BASENAME - len(ext)] + ext
+        return f"{CAS_PREFIX}{digest}/{basename}"
+
+    def delete(self, name):
+        # Blobs are shared between rows; gc_blobs removes them once unreferenced.
+        if blob_hash(name):
+            return
+        super().delete(name)
+
+
+def content_storage():
+    return _content_storage
+
+
+_content_storage = ContentAddressedStorage()
+
+
+def add_reference(name, delta):
+    """
+    Adjusts the reference count of the blob behind `name`, creating its
+    Blob row on first use. Legacy names are ignored.
+    """
+    from .models import Blob
+
+    digest = blob_hash(name)
+    if digest is None:
+        return
+    if Blob.objects.filter(sha256=digest).update(refcount=F('refcount') + delta):
+        return
+    size = _content_storage.size(name) if _content_storage.exists(name) else 0
+    try:
+        with transaction.atomic():
+            Blob.objects.create(sha256=digest, size=size, refcount=max(delta, 0))
+    except IntegrityError:
+        Blob.objects.filter(sha256=digest).update(refcount=F('refcount') + delta)
+
+
+def tracked_fields():
+    """
+    (model, field name) pairs whose files live in the content-addressed store.
+    """
+    from .models import File, Profile, UploadedFile
+
+    return [(File, 'file'), (UploadedFile, 'file'), (Profile, 'profile_image')]
+
+
+def referenced_names():
+    for model, field in tracked_fields():
+        names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        yield from names.values_list(field, flat=True).iterator(chunk_size=2000)
+
+
+def recount_references():
+    """
+    Rebuilds every Blob.refcount from the tables that reference blobs.
+    """
+    from .models import Blob
+
+    counts = {}
+    for name in referenced_names():
+        digest = blob_hash(name)
+        if digest:
+            counts[digest] = counts.get(digest, 0) + 1
+
+    with transaction.atomic():
+        Blob.objects.exclude(sha256__in=counts).update(refcount=0)
+        for digest, refs in counts.items():
+            updated = Blob.objects.filter(sha256=digest).update(refcount=refs)
+            if not updated:
+                path = _content_storage.blob_path(digest)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                Blob.objects.create(sha256=digest, size=size, refcount=refs)
+    return len(counts)
+
+
+ORPHAN_GRACE_SECONDS = 3600
+
+
+def _in_grace_period(path):
+    try:
+        return time.time() - os.path.getmtime(path) < ORPHAN_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage(dry_run=False):
+    """
+    Deletes blobs no row references any more, plus blob files on disk with
+    no Blob row (left by interrupted saves). Either kind is kept while its
+    file was written or reused in the last ORPHAN_GRACE_SECONDS, since the
+    row referencing it may not be committed yet. Returns (files, bytes) freed.
+    """
+    from .models import Blob
+    from .thumbnails import discard as discard_thumbnails
+
+    freed_files = freed_bytes = 0
+    for blob in Blob.objects.filter(refcount__lte=0).iterator():
+        path = _content_storage.blob_path(blob.sha256)
+        with transaction.atomic():
+            # The re-check only catches references committed since the scan.
+            # A save still in flight has no reference yet; its _save touched
+            # the file, which the grace period covers.
+            locked = Blob.objects.select_for_update().filter(sha256=blob.sha256, refcount__lte=0).first()
+            if locked is None or _in_grace_period(path):
+                continue
+            if not dry_run:
+                locked.delete()
+                if os.path.exists(path):
+                    os.remove(path)
+                discard_thumbnails(blob.sha256)
+        freed_files += 1
+        freed_bytes += blob.size
+
+    blob_root = _content_storage.blob_root()
+    known = set(Blob.objects.values_list('sha256', flat=True))
+    for directory, _, filenames in os.walk(blob_root):
+        for filename in filenames:
+            if len(filename) != 64 or filename in known:
+                continue
+            path = os.path.join(directory, filename)
+            if _in_grace_period(path):
+                continue
+            freed_files += 1
+            freed_bytes += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+                discard_thumbnails(filename)
+    return freed_files, freed_bytes
+
+
+def dedup_stats():
+    """
+    Bytes actually on disk versus bytes the File/UploadedFile rows refer to.
+    """
+    from django.db.models import Sum
+    from .models import Blob
+
+    totals = Blob.objects.filter(refcount__gt=0).aggregate(
+        stored=Sum('size'), referenced=Sum(F('size') * F('refcount')),
+    )
+    stored = totals['stored'] or 0
+    referenced = totals['referenced'] or 0
+    return {'stored': stored, 'referenced': referenced, 'saved': referenced - stored}
@@ -1,4 +1,6 @@
 from django import template
+from django.urls import reverse
+from UserApp.thumbnails import thumbnail_name
 register = template.Library()
 
 @register.filter
@@ -7,6 +9,15 @@ def get_item(dictionary, key):
 
 @register.filter
 def user_ids(queryset):
-    return list(queryset.values_list('user_id', flat=True))
+    # Iterate rather than values_list() so prefetched rows are reused.
+    return [access.user_id for access in queryset.all()]
 
+@register.filter
+def avatar(profile):
+    # The view falls back to the original until the avatar is rendered.
+    return reverse('profile_image', args=['avatar']) if profile.profile_image else ''
 
+@register.filter
+def preview(file):
+    # Only images get a preview; no stat here, the view checks the disk.
+    return reverse('file_thumbnail', args=[file.pk, 'preview']) if thumbnail_name(file.file.name, 'preview') else ''
@@ -1,3 +1,1126 @@
-from django.test import TestCase
+import csv
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from io import BytesIO, StringIO
+from PIL import Image
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .archive import archivable_months, hot_since, read_archive
+from .audit import ActivityLogWriter
+from .counters import totals
+from . import otp
+from .mailer import deliver_pending
+from .middleware import user_key, version_key
+from .models import (
+    ActivityArchive, ActivityLog, Blob, Category, ChunkedUpload, Counter, CustomUser, File, FileAccess, FileCategoryMapping, OutboundEmail,
+    Profile, SearchDocument, UploadedFile,
+)
+from .pagination import CursorPaginator
+from .search import search
+from .permissions import can_view, visible_files
+from .services import reassign_category, set_file_access
+from .sessions import SessionStore
+from .storage import ORPHAN_GRACE_SECONDS, dedup_stats
+from .thumbnails import thumbnail_name
+from .uploads import append_chunk, finalize_upload, part_path, start_upload
+from .utils import log_activity, log_event
 
-# Create your tests here.
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CategoryListQueryTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('boss', 'boss@example.com', 'pw', role='admin')
+        self.category = Category.objects.create(name='Reports')
+        self.client.force_login(self.admin)
+
+    def add_assignments(self, count):
+        start = File.objects.count()
+        for i in range(start, start + count):
+            employee = CustomUser.objects.create_user(f'emp{i}', role='employee')
+            file = File.objects.create(uploader=self.admin, title=f'doc {i}', file=ContentFile(b'x', name='doc.txt'))
+            FileAccess.objects.create(file=file, user=employee)
+            FileCategoryMapping.objects.create(
+                file=file, category=self.category, assigned_by=self.admin, reassigned_by=self.admin
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('category_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_assignments(self):
+        self.add_assignments(2)
+        # The first request also fills the cached user; measure after it.
+        self.count_queries()
+        small = self.count_queries()
+        self.add_assignments(10)
+        large = self.count_queries()
+        self.assertEqual(small, large)
+
+    def test_redirecting_post_skips_the_assignment_page(self):
+        self.add_assignments(1)
+        employee = CustomUser.objects.get(username='emp0')
+        with mock.patch('UserApp.views.assignment_page') as page:
+            response = self.client.post(reverse('category_list'), {
+                'bulk_category': self.category.id, 'assign_to': [employee.id],
+            })
+        self.assertRedirects(response, reverse('category_list'), fetch_redirect_response=False)
+        page.assert_not_called()
+
+    def test_bad_assign_to_ids_are_rejected_with_a_message(self):
+        self.add_assignments(1)
+        mapping = FileCategoryMapping.objects.get()
+        for data in ({'bulk_category': self.category.id, 'assign_to': ['abc']},
+                     {'bulk_category': self.category.id, 'assign_to': ['999999']},
+                     {'assignment_id': mapping.id, 'assign_to': [str(self.admin.id)]},
+                     {'assignment_id': mapping.id, 'category': '999999'}):
+            response = self.client.post(reverse('category_list'), data, follow=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual({m.level_tag for m in response.context['messages']}, {'error'})
+        self.assertEqual(FileAccess.objects.get().user.username, 'emp0')
+        mapping.refresh_from_db()
+        self.assertIsNone(mapping.reassigned_at)
+
+    def test_keyset_pages_cover_every_assignment_once(self):
+        self.add_assignments(25)
+        first = self.client.get(reverse('category_list'))
+        second = self.client.get(reverse('category_list'), {'cursor': first.context['assignments'].next_cursor})
+        ids = [a.id for a in first.context['assignments']] + [a.id for a in second.context['assignments']]
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+        self.assertIsNone(second.context['assignments'].next_cursor)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ChartDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('viewer', role='employee')
+        self.client.force_login(self.user)
+
+    def test_counts_come_from_one_grouped_query_and_are_cached(self):
+        UploadedFile.objects.create(name='a', file=ContentFile(b'a', name='a.txt'))
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse('chart_data'), {'days': 30}).json()
+        upload_queries = [q for q in ctx.captured_queries if 'FROM "UserApp_uploadedfile"' in q['sql']]
+        self.assertEqual(len(upload_queries), 1)
+        self.assertEqual(len(data['upload_counts']), 30)
+        self.assertEqual(data['upload_counts'][-1], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('chart_data'), {'days': 30})
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "UserApp_uploadedfile"' in q['sql']])
+
+    def test_upload_invalidates_cached_window(self):
+        self.client.get(reverse('chart_data'), {'days': 7})
+        UploadedFile.objects.create(name='b', file=ContentFile(b'b', name='b.txt'))
+        data = self.client.get(reverse('chart_data'), {'days': 7}).json()
+        self.assertEqual(sum(data['upload_counts']), 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CounterTests(TestCase):
+    def test_signals_track_totals_and_days(self):
+        user = CustomUser.objects.create_user('counted')
+        category = Category.objects.create(name='Misc')
+        upload = UploadedFile.objects.create(name='c', file=ContentFile(b'c', name='c.txt'), category=category)
+        self.assertEqual(totals('uploadedfile', 'category', 'user'), {'uploadedfile': 1, 'category': 1, 'user': 1})
+
+        upload.delete()
+        self.assertEqual(totals('uploadedfile')['uploadedfile'], 0)
+        day = Counter.objects.get(name='user', day=timezone.localdate(user.date_joined))
+        self.assertEqual(day.value, 1)
+
+    def test_rebuild_matches_source_tables(self):
+        CustomUser.objects.create_user('one')
+        CustomUser.objects.bulk_create([CustomUser(username='two'), CustomUser(username='three')])
+        self.assertEqual(totals('user')['user'], 1)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(totals('user')['user'], 3)
+
+
+class ActivityLogWriterTests(TestCase):
+    def test_log_inside_transaction_writes_immediately(self):
+        user = CustomUser.objects.create_user('logger', role='manager')
+        log_activity(user, "Logged in")
+        entry = ActivityLog.objects.get()
+        self.assertEqual((entry.user, entry.role, entry.action), (user, 'manager', "Logged in"))
+
+    def test_queued_entries_flush_in_batches_and_overflow_is_counted(self):
+        writer = ActivityLogWriter(batch_size=2, max_queue=3)
+        for i in range(4):
+            writer.enqueue(ActivityLog(role='Anonymous', action=f"event {i}"))
+        self.assertEqual(writer.stats(), {'queue_depth': 3, 'written': 0, 'dropped': 1})
+
+        writer.flush()
+        self.assertEqual(ActivityLog.objects.count(), 3)
+        self.assertEqual(writer.stats(), {'queue_depth': 0, 'written': 3, 'dropped': 1})
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        for i in range(7):
+            CustomUser.objects.create_user(f'user{i}')
+        self.paginator = CursorPaginator(CustomUser.objects.all(), ('username', 'id'), 3)
+
+    def names(self, page):
+        return [u.username for u in page]
+
+    def test_walks_forward_and_back(self):
+        first = self.paginator.get_page()
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(self.names(first), ['user0', 'user1', 'user2'])
+        self.assertEqual(self.names(second), ['user3', 'user4', 'user5'])
+        self.assertEqual(self.names(third), ['user6'])
+        self.assertFalse(third.has_next())
+
+        back = self.paginator.get_page(second.previous_cursor)
+        self.assertEqual(self.names(back), ['user0', 'user1', 'user2'])
+        self.assertFalse(back.has_previous())
+
+    def test_legacy_page_numbers_and_bad_cursors(self):
+        page = self.paginator.get_page(page_number='2')
+        self.assertEqual(self.names(page), ['user3', 'user4', 'user5'])
+        self.assertTrue(page.has_previous())
+        self.assertEqual(self.names(self.paginator.get_page('not-a-cursor')), ['user0', 'user1', 'user2'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class FileAccessServiceTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user('owner', role='manager')
+        self.users = [CustomUser.objects.create_user(f'member{i}') for i in range(4)]
+        self.files = [
+            File.objects.create(uploader=self.owner, title=f'f{i}', file=ContentFile(b'f', name='f.txt'))
+            for i in range(3)
+        ]
+
+    def access(self):
+        return set(FileAccess.objects.values_list('file_id', 'user_id'))
+
+    def test_replace_diffs_against_current_access(self):
+        set_file_access(self.files, [self.users[0].pk, self.users[1].pk])
+        # select current rows, insert, collect + delete (post_delete feeds the permission cache)
+        with self.assertNumQueries(6):
+            added, removed = set_file_access(self.files, [self.users[1].pk, self.users[2].pk])
+        self.assertEqual((added, removed), (3, 3))
+        expected = {(f.pk, u.pk) for f in self.files for u in self.users[1:3]}
+        self.assertEqual(self.access(), expected)
+
+    def test_reassign_category_moves_every_mapped_file(self):
+        category = Category.objects.create(name='Team')
+        for f in self.files[:2]:
+            FileCategoryMapping.objects.create(file=f, category=category)
+        set_file_access(self.files, [self.users[0].pk])
+
+        file_count, _ = reassign_category(category, [self.users[3].pk], self.owner)
+        self.assertEqual(file_count, 2)
+        self.assertEqual(self.access(), {
+            (self.files[0].pk, self.users[3].pk),
+            (self.files[1].pk, self.users[3].pk),
+            (self.files[2].pk, self.users[0].pk),
+        })
+        self.assertFalse(FileCategoryMapping.objects.filter(reassigned_by__isnull=True).exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = CustomUser.objects.create_user('lead', role='manager')
+        self.employee = CustomUser.objects.create_user('staff', role='employee')
+        self.other = CustomUser.objects.create_user('other', role='employee')
+        self.own = File.objects.create(uploader=self.employee, title='own', file=ContentFile(b'o', name='o.txt'))
+        self.managers = File.objects.create(uploader=self.manager, title='plan', file=ContentFile(b'p', name='p.txt'))
+
+    def test_warm_checks_do_not_touch_the_database(self):
+        can_view(self.employee, self.managers)
+        can_view(self.manager, self.own)
+        with self.assertNumQueries(0):
+            self.assertTrue(can_view(self.employee, self.own))
+            self.assertFalse(can_view(self.employee, self.managers))
+            self.assertTrue(can_view(self.manager, self.own))
+
+    def test_access_changes_invalidate_the_cached_set(self):
+        self.assertFalse(can_view(self.employee, self.managers))
+        set_file_access([self.managers], [self.employee.pk])
+        self.assertTrue(can_view(self.employee, self.managers))
+        self.assertIn(self.managers, visible_files(self.employee))
+
+        FileAccess.objects.filter(user=self.employee).delete()
+        self.assertFalse(can_view(self.employee, self.managers))
+
+    def test_visible_files_sql_does_not_grow_with_grants(self):
+        set_file_access([self.managers], [self.employee.pk])
+        small = str(visible_files(self.employee).query)
+        extra = [File.objects.create(uploader=self.manager, title=f'f{i}', file=ContentFile(b'x', name='x.txt'))
+                 for i in range(5)]
+        set_file_access(extra, [self.employee.pk])
+        self.assertEqual(str(visible_files(self.employee).query), small)
+        self.assertEqual(visible_files(self.employee).count(), 7)
+
+    def test_role_change_invalidates_employee_set(self):
+        self.assertTrue(can_view(self.manager, self.own))
+        self.employee.role = 'manager'
+        self.employee.save()
+        self.assertFalse(can_view(self.manager, self.own))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, FILE_DOWNLOAD_OFFLOAD=None)
+class FileDownloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = CustomUser.objects.create_user('uploader', role='employee')
+        self.file = File.objects.create(uploader=self.owner, title='data', file=ContentFile(b'0123456789', name='data.txt'))
+        self.url = reverse('file_download', args=[self.file.id])
+        self.client.force_login(self.owner)
+
+    def test_full_download_streams_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        cached = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        suffix = self.client.get(self.url, headers={'Range': 'bytes=-3'})
+        self.assertEqual(b''.join(suffix.streaming_content), b'789')
+
+        unsatisfiable = self.client.get(self.url, headers={'Range': 'bytes=20-'})
+        self.assertEqual(unsatisfiable.status_code, 416)
+
+    async def test_asgi_download_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.owner)
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'0123456789')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = await self.async_client.get(self.url, headers={'Range': 'bytes=2-5'})
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'2345')
+
+    def test_missing_blob_is_a_404(self):
+        os.remove(self.file.file.path)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_access_is_checked_and_offload_sends_no_body(self):
+        stranger = CustomUser.objects.create_user('stranger', role='employee')
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(self.owner)
+        with self.settings(FILE_DOWNLOAD_OFFLOAD='nginx'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.file.file.name)
+        self.assertEqual(response.content, b'')
+
+        self.file.file = ContentFile(b'x', name='résumé 2024.txt')
+        self.file.save()
+        with self.settings(FILE_DOWNLOAD_OFFLOAD='nginx'):
+            response = self.client.get(self.url)
+        self.assertTrue(response['X-Accel-Redirect'].endswith('/r%C3%A9sum%C3%A9_2024.txt'))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CHUNKED_UPLOAD_DIR=os.path.join(MEDIA_ROOT, 'chunks'), CHUNKED_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('bigfile', role='employee')
+        self.client.force_login(self.user)
+
+    def put_chunk(self, upload_id, offset, data):
+        return self.client.put(
+            reverse('chunked_upload_chunk', args=[upload_id]), data,
+            content_type='application/octet-stream', headers={'Upload-Offset': str(offset)},
+        )
+
+    def test_chunks_resume_and_finalize_into_a_file(self):
+        payload = b'hello chunked world'
+        start = self.client.post(reverse('chunked_upload_start'), {
+            'title': 'Big', 'description': 'd', 'filename': 'big.bin', 'size': len(payload),
+        }).json()
+        upload_id = start['upload_id']
+
+        self.assertEqual(self.put_chunk(upload_id, 0, payload[:4]).json()['offset'], 4)
+        stale = self.put_chunk(upload_id, 0, payload[:4])
+        self.assertEqual((stale.status_code, stale.json()['offset']), (409, 4))
+        self.assertEqual(self.client.get(reverse('chunked_upload_chunk', args=[upload_id])).json()['offset'], 4)
+
+        for offset in range(4, len(payload), 4):
+            self.put_chunk(upload_id, offset, payload[offset:offset + 4])
+
+        done = self.client.post(
+            reverse('chunked_upload_finalize', args=[upload_id]),
+            {'sha256': hashlib.sha256(payload).hexdigest()},
+        ).json()
+        file = File.objects.get(id=done['file_id'])
+        self.assertEqual((file.title, file.uploader), ('Big', self.user))
+        with file.file.open('rb') as handle:
+            self.assertEqual(handle.read(), payload)
+        self.assertTrue(ActivityLog.objects.filter(action="Uploaded file: Big").exists())
+
+    def test_failed_chunk_leaves_the_cached_digest_alone(self):
+        upload = start_upload(self.user, 'Retry', 'retry.bin', 8)
+        with self.captureOnCommitCallbacks(execute=True):
+            append_chunk(upload.id, self.user, 0, b'abcd')
+        with mock.patch.object(ChunkedUpload, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                append_chunk(upload.id, self.user, 4, b'XXXX')
+        with self.captureOnCommitCallbacks(execute=True):
+            append_chunk(upload.id, self.user, 4, b'efgh')
+        file = finalize_upload(upload.id, self.user, hashlib.sha256(b'abcdefgh').hexdigest())
+        self.assertEqual(file.title, 'Retry')
+
+    def test_cleanup_removes_abandoned_sessions(self):
+        upload = start_upload(self.user, 'Lost', 'lost.bin', 10)
+        ChunkedUpload.objects.filter(id=upload.id).update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('cleanup_uploads', stdout=StringIO())
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(os.path.exists(part_path(upload)))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('dedup', role='employee')
+
+    def test_identical_uploads_share_one_blob(self):
+        first = File.objects.create(uploader=self.user, title='a', file=ContentFile(b'same bytes', name='report.pdf'))
+        second = UploadedFile.objects.create(name='b', file=ContentFile(b'same bytes', name='copy.pdf'))
+        digest = hashlib.sha256(b'same bytes').hexdigest()
+
+        self.assertEqual(first.file.name, f'cas/{digest}/report.pdf')
+        self.assertEqual(second.file.name, f'cas/{digest}/copy.pdf')
+        self.assertEqual(first.file.path, second.file.path)
+        self.assertEqual(Blob.objects.get().refcount, 2)
+        self.assertEqual(dedup_stats(), {'stored': 10, 'referenced': 20, 'saved': 10})
+
+    def test_gc_removes_blobs_once_unreferenced(self):
+        file = File.objects.create(uploader=self.user, title='a', file=ContentFile(b'short lived', name='tmp.txt'))
+        path = file.file.path
+        call_command('gc_blobs', stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+        file.delete()
+        self.assertEqual(Blob.objects.get().refcount, 0)
+        call_command('gc_blobs', stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+        self.age(path)
+        call_command('gc_blobs', stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_reused_blob_survives_gc_before_its_reference_lands(self):
+        file = File.objects.create(uploader=self.user, title='a', file=ContentFile(b'back again', name='a.txt'))
+        path = file.file.path
+        file.delete()
+        self.age(path)
+
+        # _save has reused the blob, but the row's post_save has not run yet.
+        name = File._meta.get_field('file').storage.save('b.txt', ContentFile(b'back again'))
+        self.assertEqual(Blob.objects.get().refcount, 0)
+        call_command('gc_blobs', stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(Blob.objects.exists())
+        self.assertEqual(File._meta.get_field('file').storage.path(name), path)
+
+    def age(self, path):
+        old = time.time() - 2 * ORPHAN_GRACE_SECONDS
+        os.utime(path, (old, old))
+
+
+def png_bytes(size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('pictured', role='employee')
+
+    def test_profile_image_gets_a_cropped_avatar(self):
+        profile = Profile.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_image = ContentFile(png_bytes(), name='me.png')
+            profile.save()
+
+        path = os.path.join(MEDIA_ROOT, thumbnail_name(profile.profile_image.name, 'avatar'))
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (160, 160))
+
+        self.client.force_login(self.user)
+        url = reverse('profile_image', args=['avatar'])
+        self.assertContains(self.client.get(reverse('profile')), url)
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (160, 160))
+
+    def test_image_uploads_get_previews_and_other_files_do_not(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = File.objects.create(uploader=self.user, title='pic', file=ContentFile(png_bytes(), name='pic.png'))
+            text = File.objects.create(uploader=self.user, title='txt', file=ContentFile(b'plain', name='notes.txt'))
+
+        with Image.open(os.path.join(MEDIA_ROOT, thumbnail_name(image.file.name, 'preview'))) as preview:
+            self.assertEqual(preview.size, (320, 240))
+        self.assertIsNone(thumbnail_name(text.file.name, 'preview'))
+
+    def test_previews_are_served_only_to_users_who_can_view_the_file(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = File.objects.create(uploader=self.user, title='pic', file=ContentFile(png_bytes(), name='pic.png'))
+        url = reverse('file_thumbnail', args=[image.id, 'preview'])
+
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('file_upload')), url)
+        with Image.open(BytesIO(b''.join(self.client.get(url).streaming_content))) as preview:
+            self.assertEqual(preview.size, (320, 240))
+
+        self.client.force_login(CustomUser.objects.create_user('outsider', role='employee'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+@override_settings(MAIL_QUEUE_ASYNC=False, MAIL_MAX_ATTEMPTS=2)
+class OutboundMailTests(TestCase):
+    def test_send_otp_enqueues_and_worker_delivers(self):
+        with mock.patch('UserApp.mailer.mail_worker.wake') as wake:
+            response = self.client.post(reverse('send_otp'), {'email': 'new@example.com'})
+        self.assertEqual(response.json()['status'], 'success')
+        wake.assert_called_once()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.get().status, 'pending')
+
+        deliver_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertIn('Your OTP is', mail.outbox[0].body)
+        self.assertEqual(OutboundEmail.objects.values_list('status', 'body').get(), ('sent', ''))
+
+    def test_failures_back_off_then_dead_letter(self):
+        message = OutboundEmail.objects.create(subject='s', body='b', from_email='a@example.com', to='x@example.com')
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('relay down')):
+            self.assertEqual(deliver_pending(), 0)
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), ('pending', 1))
+            self.assertGreater(message.next_attempt_at, timezone.now())
+
+            OutboundEmail.objects.filter(id=message.id).update(next_attempt_at=timezone.now())
+            deliver_pending()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.last_error, message.body), ('dead', 'relay down', ''))
+
+
+@override_settings(MAIL_QUEUE_ASYNC=False)
+class OtpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def sent_code(self):
+        return mail.outbox[-1].body.rsplit(' ', 1)[-1]
+
+    def test_code_is_hashed_and_verify_marks_session(self):
+        self.client.post(reverse('send_otp'), {'email': 'New@Example.com'})
+        code = self.sent_code()
+        self.assertNotIn('email_otp', self.client.session)
+        self.assertNotIn(code, str(cache._cache.values()))
+
+        response = self.client.post(reverse('verify_otp'), {'email': 'new@example.com', 'otp_input': code})
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(self.client.session['email_to_verify'], 'new@example.com')
+
+        # A code is good for one verification only.
+        response = self.client.post(reverse('verify_otp'), {'email': 'new@example.com', 'otp_input': code})
+        self.assertIn('expired', response.json()['message'])
+
+    @override_settings(OTP_MAX_ATTEMPTS=2)
+    def test_wrong_codes_lock_the_otp(self):
+        self.client.post(reverse('send_otp'), {'email': 'a@example.com'})
+        code = self.sent_code()
+        wrong = '000000' if code != '000000' else '111111'
+        for _ in range(2):
+            response = self.client.post(reverse('verify_otp'), {'email': 'a@example.com', 'otp_input': wrong})
+        self.assertIn('Too many wrong attempts', response.json()['message'])
+        response = self.client.post(reverse('verify_otp'), {'email': 'a@example.com', 'otp_input': code})
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertNotIn('email_verified', self.client.session)
+
+    def test_wrong_code_keeps_the_original_expiry(self):
+        self.client.post(reverse('send_otp'), {'email': 'a@example.com'})
+        code = self.sent_code()
+        wrong = '000000' if code != '000000' else '111111'
+        key = otp._key('a@example.com')
+        expires_at = cache.get(key)[2]
+
+        with mock.patch('UserApp.otp.time.time', return_value=expires_at - 5):
+            self.client.post(reverse('verify_otp'), {'email': 'a@example.com', 'otp_input': wrong})
+            self.assertEqual(cache.get(key)[1:], (1, expires_at))
+            self.assertEqual(otp._remaining(cache.get(key)), 5)
+        with mock.patch('UserApp.otp.time.time', return_value=expires_at + 1):
+            response = self.client.post(reverse('verify_otp'), {'email': 'a@example.com', 'otp_input': code})
+        self.assertIn('expired', response.json()['message'])
+
+    @override_settings(OTP_RATE_LIMITS={'send_email': (2, 3600), 'send_ip': (4, 3600), 'verify_ip': (5, 3600)})
+    def test_send_is_rate_limited_per_email_and_ip(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('send_otp'), {'email': 'a@example.com'}).status_code, 200)
+        self.assertEqual(self.client.post(reverse('send_otp'), {'email': 'a@example.com'}).status_code, 429)
+        self.assertEqual(self.client.post(reverse('send_otp'), {'email': 'b@example.com'}).status_code, 200)
+        self.assertEqual(self.client.post(reverse('send_otp'), {'email': 'c@example.com'}).status_code, 429)
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+
+    def test_register_requires_the_verified_email(self):
+        session = self.client.session
+        session.update({'email_verified': True, 'email_to_verify': 'a@example.com'})
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        response = self.client.post(reverse('register_submit'), {'email': 'other@example.com'})
+        self.assertEqual(response.json()['errors'], {'email': ['Email must be verified']})
+        response = self.client.post(reverse('register_submit'), {'email': 'a@example.com'})
+        self.assertNotIn('Email must be verified', str(response.json()['errors']))
+
+
+@override_settings(
+    ACTIVITY_LOG_ASYNC=False,
+    LOGIN_FAILURE_LIMIT={'login-user': 3, 'login-ip': 10},
+    LOGIN_LOCKOUT_BASE=60,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LoginLockoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='alice', password='right-password')
+
+    def login(self, password, username='alice'):
+        return self.client.post(reverse('login'), {'username': username, 'password': password})
+
+    def test_lockout_skips_the_hasher_and_is_logged(self):
+        for _ in range(3):
+            self.login('wrong')
+        self.assertTrue(ActivityLog.objects.filter(action__startswith="Login locked for username 'alice' for 60s").exists())
+
+        with mock.patch('django.contrib.auth.forms.authenticate') as authenticate:
+            response = self.login('right-password')
+        authenticate.assert_not_called()
+        self.assertContains(response, 'Too many failed login attempts')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_repeat_lockouts_back_off(self):
+        for _ in range(3):
+            self.login('wrong')
+        with mock.patch('time.time', return_value=time.time() + 61):
+            for _ in range(3):
+                self.login('wrong', username='ALICE')
+        self.assertTrue(ActivityLog.objects.filter(action__contains='for 120s').exists())
+
+    def test_success_resets_the_failure_window(self):
+        for _ in range(2):
+            self.login('wrong')
+        self.login('right-password')
+        self.client.logout()
+        for _ in range(2):
+            self.login('wrong')
+        self.assertFalse(ActivityLog.objects.filter(action__startswith='Login locked').exists())
+
+    def test_empty_password_post_does_not_reset_the_window(self):
+        for _ in range(2):
+            self.login('wrong')
+        self.login('')
+        self.login('wrong')
+        self.assertTrue(ActivityLog.objects.filter(action__startswith="Login locked for username 'alice'").exists())
+
+
+@override_settings(SESSION_ENGINE='UserApp.sessions', MAIL_QUEUE_ASYNC=False)
+class HybridSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_otp_flow_stays_out_of_the_database(self):
+        self.client.post(reverse('send_otp'), {'email': 'a@example.com'})
+        code = mail.outbox[-1].body.rsplit(' ', 1)[-1]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('verify_otp'), {'email': 'a@example.com', 'otp_input': code})
+        self.assertFalse([q for q in queries if 'django_session' in q['sql']])
+        self.assertFalse(Session.objects.exists())
+        self.assertTrue(self.client.session['email_verified'])
+
+    def test_login_promotes_to_a_server_side_session(self):
+        CustomUser.objects.create_user(username='bob', password='pw-123456')
+        self.client.post(reverse('login'), {'username': 'bob', 'password': 'pw-123456'})
+        key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertNotIn(':', key)
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+
+    def test_tampered_cookie_starts_a_new_session(self):
+        store = SessionStore()
+        store['email_verified'] = True
+        store.save()
+        self.assertEqual(SessionStore(store.session_key[:-2] + 'xx').load(), {})
+
+    def test_prune_sessions_deletes_expired_rows_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{i:04d}', session_data='', expire_date=now - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key='stillvalid', session_data='', expire_date=now + timedelta(days=1))]
+        )
+        out = StringIO()
+        call_command('prune_sessions', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['stillvalid'])
+
+
+def with_cached_user_middleware():
+    # Where settings.py installs it when REDIS_URL is set.
+    middleware = list(settings.MIDDLEWARE)
+    middleware.insert(
+        middleware.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+        'UserApp.middleware.CachedUserMiddleware',
+    )
+    return middleware
+
+
+@override_settings(MIDDLEWARE=with_cached_user_middleware())
+class CachedUserMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='carol', password='pw', role='employee')
+        Profile.objects.create(user=self.user, firstname='Carol')
+        self.client.force_login(self.user)
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        sql = [q['sql'] for q in queries]
+        return response, [q for q in sql if 'FROM "UserApp_customuser"' in q or 'FROM "UserApp_profile"' in q]
+
+    def test_user_and_profile_come_from_one_query_then_the_cache(self):
+        response, queries = self.user_queries(reverse('profile'))
+        self.assertContains(response, 'Carol')
+        self.assertEqual(len(queries), 1)
+        self.assertIn('JOIN "UserApp_profile"', queries[0])
+
+        response, queries = self.user_queries(reverse('profile'))
+        self.assertContains(response, 'Carol')
+        self.assertEqual(queries, [])
+
+    def test_role_and_profile_changes_invalidate(self):
+        self.assertEqual(self.client.get(reverse('user_list')).status_code, 302)
+        self.user.role = 'manager'
+        self.user.save(update_fields=['role'])
+        self.assertEqual(self.client.get(reverse('user_list')).status_code, 200)
+
+        Profile.objects.filter(user=self.user).get().delete()
+        self.client.get(reverse('profile'))
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+
+    def test_cached_copy_has_no_password_hash(self):
+        self.client.get(reverse('profile'))
+        _, stored, auth_hash = cache.get(user_key(self.user.pk))
+        self.assertNotIn('password', stored.__dict__)
+        self.assertEqual(auth_hash, self.user.get_session_auth_hash())
+        self.assertEqual(stored.password, self.user.password)
+
+    def test_missing_version_is_a_miss(self):
+        self.client.get(reverse('profile'))
+        CustomUser.objects.filter(pk=self.user.pk).update(role='manager')
+        cache.delete(version_key(self.user.pk))
+        self.assertEqual(self.client.get(reverse('user_list')).status_code, 200)
+
+    def test_password_change_still_ends_other_sessions(self):
+        self.client.get(reverse('profile'))
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 302)
+
+
+class PasswordHashingPolicyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def login(self):
+        return self.client.post(reverse('login'), {'username': 'dave', 'password': 'pw-123456'})
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_login_rehashes_at_the_configured_cost(self):
+        user = CustomUser.objects.create_user(username='dave', password='pw-123456')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertRedirects(self.login(), reverse('dashboard'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10)
+    def test_login_moves_hashes_to_the_preferred_hasher(self):
+        user = CustomUser.objects.create_user(username='dave', password='pw-123456')
+        with self.settings(PASSWORD_HASHERS=['UserApp.hashers.ScryptPasswordHasher', 'UserApp.hashers.PBKDF2PasswordHasher']):
+            self.login()
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('scrypt$'))
+            self.assertTrue(user.check_password('pw-123456'))
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class BulkUserCommandTests(TestCase):
+    def write(self, name, text):
+        path = os.path.join(MEDIA_ROOT, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_import_csv_reports_bad_rows_and_keeps_going(self):
+        CustomUser.objects.create_user(username='taken')
+        path = self.write('users.csv', (
+            "username,email,role,password,firstname,dob,is_active\n"
+            "erin,erin@example.com,manager,Quiet-River-71,Erin,1990-04-01,\n"
+            "taken,t@example.com,,Quiet-River-72,,,\n"
+            "frank,not-an-email,,Quiet-River-73,,,\n"
+            "gina,,boss,,,,\n"
+            "erin,dup@example.com,,Quiet-River-74,,,\n"
+            "hank,,,,,,no\n"
+            "ivan,,,x,,,\n"
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_users', path, workers=0, batch_size=2, stdout=out, stderr=err)
+
+        self.assertIn('Created 2 users, 5 rows failed.', out.getvalue())
+        self.assertEqual(
+            [line.split(':')[0] for line in err.getvalue().splitlines()],
+            ['line 3', 'line 4', 'line 5', 'line 6', 'line 8'],
+        )
+        self.assertIn('too short', err.getvalue().splitlines()[-1])
+        erin = CustomUser.objects.select_related('profile').get(username='erin')
+        self.assertEqual((erin.role, erin.profile.firstname, str(erin.profile.dob)), ('manager', 'Erin', '1990-04-01'))
+        self.assertTrue(erin.check_password('Quiet-River-71'))
+        self.assertTrue(erin.is_active)
+        hank = CustomUser.objects.get(username='hank')
+        self.assertFalse(hank.has_usable_password())
+        self.assertFalse(hank.is_active)
+        self.assertEqual(totals('user')['user'], CustomUser.objects.count())
+
+    def test_import_rejects_duplicate_emails(self):
+        CustomUser.objects.create_user(username='owner', email='owner@example.com')
+        path = self.write('users.csv', (
+            "username,email\n"
+            "jay,owner@example.com\n"
+            "kim,kim@example.com\n"
+            "lee,\n"
+            "mo,kim@example.com\n"
+            "nia,\n"
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_users', path, workers=0, batch_size=2, stdout=out, stderr=err)
+
+        self.assertIn('Created 3 users, 2 rows failed.', out.getvalue())
+        self.assertEqual(err.getvalue().splitlines(), [
+            "line 2: email: 'owner@example.com' already exists.",
+            "line 5: email: 'kim@example.com' already exists.",
+        ])
+
+    def test_missing_input_file_is_a_command_error(self):
+        with self.assertRaises(CommandError):
+            call_command('import_users', os.path.join(MEDIA_ROOT, 'missing.csv'), workers=0, stdout=StringIO())
+
+    def test_export_round_trips_through_import(self):
+        user = CustomUser.objects.create_user(username='ivy', email='ivy@example.com', password='pw', role='admin')
+        Profile.objects.create(user=user, city='Pune')
+        out = StringIO()
+        call_command('export_users', format='jsonl', password_hashes=True, stdout=out, stderr=StringIO())
+        Profile.objects.all().delete()
+        CustomUser.objects.all().delete()
+
+        path = self.write('users.jsonl', out.getvalue())
+        call_command('import_users', path, workers=0, stdout=StringIO(), stderr=StringIO())
+        ivy = CustomUser.objects.get(username='ivy')
+        self.assertEqual((ivy.role, ivy.profile.city), ('admin', 'Pune'))
+        self.assertTrue(ivy.check_password('pw'))
+
+
+class DatabaseSettingsTests(TestCase):
+    def test_sqlite_connections_wait_for_the_write_lock(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+@override_settings(MAIL_QUEUE_ASYNC=False, PASSWORD_PBKDF2_ITERATIONS=1000)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    async def test_registration_flow_runs_on_the_async_client(self):
+        await self.async_client.post(reverse('send_otp'), {'email': 'jo@example.com'})
+        code = mail.outbox[-1].body.rsplit(' ', 1)[-1]
+        response = await self.async_client.post(reverse('verify_otp'), {'email': 'jo@example.com', 'otp_input': code})
+        self.assertEqual(response.json()['status'], 'success')
+
+        response = await self.async_client.post(reverse('register_submit'), {
+            'username': 'jo', 'email': 'jo@example.com', 'role': 'employee',
+            'password1': 'a-Long-pass-123', 'password2': 'a-Long-pass-123',
+        })
+        self.assertEqual(response.json(), {'status': 'success', 'redirect': '/dashboard/'})
+        self.assertTrue(await CustomUser.objects.filter(username='jo').aexists())
+        self.assertEqual(len(mail.outbox), 1)
+
+    async def test_chart_data_requires_login_and_serves_json(self):
+        response = await self.async_client.get(reverse('chart_data'))
+        self.assertEqual(response.status_code, 302)
+
+        user = await CustomUser.objects.acreate(username='kim', role='employee')
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse('chart_data'), {'days': 30})
+        self.assertEqual(len(response.json()['upload_dates']), 30)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SearchTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('boss', role='admin')
+        self.employee = CustomUser.objects.create_user('emp', role='employee')
+        self.mine = File.objects.create(uploader=self.employee, title='Quarterly budget',
+                                        description='budget draft', file=ContentFile(b'a', name='a.txt'))
+        self.other = File.objects.create(uploader=self.admin, title='Budget forecast',
+                                         file=ContentFile(b'b', name='b.txt'))
+        Category.objects.create(name='Budgets', description='finance')
+        log_activity(self.admin, "Approved the budget")
+
+    def found(self, user, query):
+        return [(doc.kind, doc.title) for doc in search(user, query).order_by('-rank', '-id')]
+
+    def test_signals_keep_documents_in_sync(self):
+        self.assertEqual(SearchDocument.objects.count(), 4)
+        self.mine.title = 'Annual payroll'
+        self.mine.save()
+        self.assertEqual(self.found(self.admin, 'payroll'), [('file', 'Annual payroll')])
+        self.mine.delete()
+        self.assertEqual(self.found(self.admin, 'payroll'), [])
+
+    def test_prefix_match_ranked_and_filtered_by_permission(self):
+        results = self.found(self.admin, 'budg')
+        self.assertEqual(len(results), 4)
+        # Two matching words outrank one.
+        self.assertEqual(results[0], ('file', 'Quarterly budget'))
+        self.assertEqual(self.found(self.employee, 'budget'), [('file', 'Quarterly budget')])
+        self.assertEqual(self.found(self.employee, '"*'), [])
+
+    def test_view_pages_with_cursors(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('search'), {'q': 'budget'})
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertEqual(self.client.get(reverse('search'), {'q': ''}).json()['results'], [])
+
+        with mock.patch('UserApp.views.SEARCH_RESULTS_PER_PAGE', 3):
+            first = self.client.get(reverse('search'), {'q': 'budget'}).json()
+            second = self.client.get(reverse('search'), {'q': 'budget', 'cursor': first['next_cursor']}).json()
+        self.assertEqual(len(first['results']), 3)
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(second['results'][0]['url'], reverse('activity_log'))
+
+    def test_rebuild_command(self):
+        SearchDocument.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 4', out.getvalue())
+        self.assertEqual(len(self.found(self.admin, 'budget')), 4)
+
+
+@override_settings(ACTIVITY_LOG_RETENTION_MONTHS=1)
+class ActivityArchiveTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.user = CustomUser.objects.create_user('ann', role='admin')
+        now = timezone.now()
+        self.old = [
+            ActivityLog.objects.create(user=self.user, role='admin', action=f'old {i}', created_at=now - timedelta(days=100 + i))
+            for i in range(3)
+        ]
+        self.recent = ActivityLog.objects.create(user=self.user, role='admin', action='recent', created_at=now)
+
+    def test_hot_since_counts_whole_months(self):
+        now = datetime(2026, 3, 15, 12, tzinfo=dt_timezone.utc)
+        self.assertEqual(hot_since(now), datetime(2026, 2, 1, tzinfo=dt_timezone.utc))
+
+    def test_archive_moves_old_months_to_files(self):
+        out = StringIO()
+        call_command('archive_activity', output_dir=self.directory, batch_size=2, stdout=out)
+        self.assertIn('Archived 3 activity log entries', out.getvalue())
+        self.assertEqual(list(ActivityLog.objects.all()), [self.recent])
+        self.assertFalse(SearchDocument.objects.filter(kind='activity', object_id__in=[e.pk for e in self.old]).exists())
+        self.assertEqual(archivable_months(), [])
+
+        rows = [row for archive in ActivityArchive.objects.all() for row in read_archive(archive.path)]
+        self.assertEqual(sorted(row['action'] for row in rows), ['old 0', 'old 1', 'old 2'])
+        self.assertEqual(rows[0]['username'], 'ann')
+        self.assertEqual(sum(ActivityArchive.objects.values_list('rows', flat=True)), 3)
+
+        call_command('archive_activity', output_dir=self.directory, stdout=StringIO())
+        self.assertEqual(sum(ActivityArchive.objects.values_list('rows', flat=True)), 3)
+
+    def test_interrupted_run_is_finished_without_writing_twice(self):
+        with mock.patch('UserApp.archive._purge'):
+            call_command('archive_activity', output_dir=self.directory, stdout=StringIO())
+        self.assertTrue(ActivityLog.objects.filter(pk=self.old[0].pk).exists())
+        parts = ActivityArchive.objects.count()
+        call_command('archive_activity', output_dir=self.directory, stdout=StringIO())
+        self.assertEqual(ActivityArchive.objects.count(), parts)
+        self.assertFalse(ActivityLog.objects.filter(created_at__lt=hot_since()).exists())
+
+    def test_activity_log_view_shows_only_the_retention_window(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('activity_log'))
+        self.assertEqual(list(response.context['page_obj']), [self.recent])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ActivityEventTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('root', role='admin')
+        self.employee = CustomUser.objects.create_user('emp', role='employee')
+        self.file = File.objects.create(uploader=self.employee, title='Plan', file=ContentFile(b'p', name='p.txt'))
+        log_event(self.employee, 'file_uploaded', target=self.file, title='Plan')
+        log_event(self.employee, 'login')
+        log_event(self.admin, 'file_edited', target=self.file, title='Plan')
+        self.client.force_login(self.admin)
+
+    def shown(self, **filters):
+        response = self.client.get(reverse('activity_log'), filters)
+        return [(log.user.username, log.event) for log in response.context['page_obj']]
+
+    def test_log_event_stores_typed_columns_and_message(self):
+        entry = ActivityLog.objects.get(event='file_uploaded')
+        self.assertEqual(entry.target, self.file)
+        self.assertEqual(entry.data, {'title': 'Plan'})
+        self.assertEqual(entry.action, "Uploaded file: Plan")
+
+    def test_view_filters(self):
+        self.assertEqual(self.shown(user='emp'), [('emp', 'login'), ('emp', 'file_uploaded')])
+        self.assertEqual(self.shown(event='file_edited'), [('root', 'file_edited')])
+        self.assertEqual(len(self.shown(target_type='file', target_id=self.file.pk)), 2)
+        self.assertEqual(self.shown(target_type='file', target_id=self.file.pk + 1), [])
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.assertEqual(self.shown(since=tomorrow.isoformat()), [])
+        self.assertEqual(len(self.shown(until=tomorrow.isoformat(), event='bogus')), 3)
+
+    def test_filtered_pages_keep_filters_in_links(self):
+        for _ in range(20):
+            log_event(self.employee, 'login')
+        response = self.client.get(reverse('activity_log'), {'event': 'login'})
+        self.assertContains(response, 'href="?event=login&cursor=')
+
+    def test_data_migration_parses_old_actions(self):
+        ActivityLog.objects.all().delete()
+        for action in ["Edited file: Plan", "Deleted user: bob", "Imported 12 users from u.csv", "Something else"]:
+            ActivityLog.objects.create(role='admin', action=action)
+        migration = importlib.import_module('UserApp.migrations.0021_activitylog_events')
+        migration.parse_actions(apps, mock.Mock(connection=connection))
+
+        rows = list(ActivityLog.objects.order_by('id').values_list('event', 'target_type', 'target_id', 'data'))
+        file_type = ContentType.objects.get_for_model(File).pk
+        self.assertEqual(rows, [
+            ('file_edited', file_type, self.file.pk, {'title': 'Plan'}),
+            ('user_deleted', None, None, {'username': 'bob'}),
+            ('users_imported', None, None, {'count': 12, 'filename': 'u.csv'}),
+            ('other', None, None, {}),
+        ])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('root', role='admin')
+        self.employee = CustomUser.objects.create_user('emp', role='employee')
+        file = File.objects.create(uploader=self.employee, title='Plan', file=ContentFile(b'p', name='p.txt'))
+        file.assign_category(Category.objects.create(name='Ops'), assigned_by=self.admin)
+        for _ in range(3):
+            log_event(self.employee, 'login')
+        log_event(self.admin, 'file_edited', target=file, title='Plan')
+
+    def test_admin_only(self):
+        self.client.force_login(self.employee)
+        response = self.client.get(reverse('export', args=['activity']))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('export', args=['users'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export', args=['files']), {'format': 'xml'}).status_code, 404)
+
+    def test_activity_csv_streams_in_chunks_with_ui_filters(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=['activity']), {'event': 'login', 'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 2)
+        rows = list(csv.DictReader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual([(row['username'], row['event']) for row in rows], [('emp', 'login')] * 3)
+
+    def test_csv_cells_cannot_start_a_formula(self):
+        File.objects.create(uploader=self.employee, title='=HYPERLINK("http://x")', description='-1+2',
+                            file=ContentFile(b'q', name='q.txt'))
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=['files']), {'format': 'csv'})
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual((rows[0]['title'], rows[0]['description']), ('\'=HYPERLINK("http://x")', "'-1+2"))
+        self.assertEqual(rows[1]['title'], 'Plan')
+
+        response = self.client.get(reverse('export', args=['files']), {'format': 'jsonl'})
+        first = json.loads(b''.join(response.streaming_content).splitlines()[0])
+        self.assertEqual(first['title'], '=HYPERLINK("http://x")')
+
+    def test_files_and_assignments_jsonl(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=['files']), {'format': 'jsonl'})
+        files = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(f['title'], f['uploader']) for f in files], [('Plan', 'emp')])
+
+        response = self.client.get(reverse('export', args=['assignments']), {'format': 'jsonl'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(r['file'], r['category'], r['assigned_by']) for r in rows], [('Plan', 'Ops', 'root')])
+
+    async def test_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('export', args=['activity']), {'format': 'jsonl'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 4)
@@ -0,0 +1,114 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.db import transaction
+from .downloads import serve_file, serve_stored
+from .imaging import render_thumbnail
+from .storage import blob_hash, content_storage
+
+logger = logging.getLogger(__name__)
+
+# name -> (box size, crop to fill)
+VARIANTS = {
+    'avatar': ((160, 160), True),
+    'preview': ((320, 320), False),
+}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_image(name):
+    return os.path.splitext(name or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def thumbnail_name(name, variant):
+    """
+    Media-relative name of a variant, keyed by the source's content hash so
+    it never goes stale. None for files stored before content addressing.
+    """
+    digest = blob_hash(name)
+    if digest is None or not is_image(name):
+        return None
+    extension = 'webp' if settings.THUMBNAIL_FORMAT == 'WEBP' else 'jpg'
+    return f"thumbs/{variant}/{digest[:2]}/{digest}.{extension}"
+
+
+def serve_thumbnail(request, field_file, variant):
+    """
+    Serves the rendered variant of `field_file`, or the original until it
+    has been rendered. Callers check access first, as for downloads: media
+    is not served publicly.
+    """
+    name = thumbnail_name(field_file.name, variant)
+    storage = content_storage()
+    if name and storage.exists(name):
+        return serve_stored(request, storage, name, as_attachment=False)
+    return serve_file(request, field_file, as_attachment=False)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _report(future):
+    global _executor
+    try:
+        future.result()
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next job.
+        logger.exception("Thumbnail pool broke; restarting it")
+        with _executor_lock:
+            _executor = None
+    except Exception:
+        logger.exception("Thumbnail job failed")
+
+
+def generate(field_file, variant):
+    """
+    Renders one variant, in the process pool when THUMBNAIL_ASYNC is on.
+    """
+    name = thumbnail_name(field_file.name, variant)
+    if name is None:
+        return
+    target = os.path.join(settings.MEDIA_ROOT, name)
+    if os.path.exists(target):
+        return
+    size, crop = VARIANTS[variant]
+    args = (field_file.path, target, size, settings.THUMBNAIL_FORMAT, crop)
+    if settings.THUMBNAIL_ASYNC:
+        _get_executor().submit(render_thumbnail, *args).add_done_callback(_report)
+    else:
+        render_thumbnail(*args)
+
+
+def schedule(field_file, variant):
+    """
+    Queues a variant once the current transaction commits, so the request
+    never waits on image decoding.
+    """
+    if field_file and is_image(field_file.name):
+        transaction.on_commit(lambda: generate(field_file, variant))
+
+
+def discard(digest):
+    """
+    Removes every rendered variant of a blob that is being deleted.
+    """
+    for variant in VARIANTS:
+        for extension in ('webp', 'jpg'):
+            path = os.path.join(settings.MEDIA_ROOT, 'thumbs', variant, digest[:2], f"{digest}.{extension}")
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import threading
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.db import transaction
+from django.utils import timezone
+from .models import ChunkedUpload, File
+from .utils import log_event
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# upload id -> (bytes hashed, sha256 object). Lets each chunk extend the
+# running digest instead of re-reading the part file. Entries only change
+# once the chunk's transaction commits, so a rolled-back chunk never leaves
+# a digest ahead of ChunkedUpload.received.
+#
+# The cache is per process. When chunks of one upload land on different
+# workers, each miss re-reads the whole part file so far, under the upload's
+# row lock (on SQLite, the database write lock), so I/O grows quadratically
+# with the number of worker switches. Route an upload's chunks to one
+# worker, or use few large chunks, when running several processes.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, message, offset=None):
+        super().__init__(message)
+        self.offset = offset
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{upload.id}.part")
+
+
+def start_upload(user, title, filename, size, description=''):
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    upload = ChunkedUpload.objects.create(
+        user=user, title=title, description=description, filename=os.path.basename(filename), size=size
+    )
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def _hasher_for(upload):
+    with _hashers_lock:
+        state = _hashers.get(upload.id)
+    if state and state[0] == upload.received:
+        # A copy, so the cached digest is untouched if this chunk rolls back.
+        return state[1].copy()
+
+    hasher = hashlib.sha256()
+    remaining = upload.received
+    with open(part_path(upload), 'rb') as handle:
+        while remaining > 0:
+            block = handle.read(min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def append_chunk(upload_id, user, offset, data):
+    """
+    Writes `data` at `offset`, which must equal the number of bytes already
+    received, and returns the new offset. A chunk that repeats after a
+    dropped connection is rejected with the offset to resume from.
+    """
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().filter(
+            id=upload_id, user=user, completed_at__isnull=True
+        ).first()
+        if upload is None:
+            raise UploadError("Upload not found.")
+        if offset != upload.received:
+            raise UploadError("Offset does not match the bytes received.", offset=upload.received)
+        if upload.received + len(data) > upload.size:
+            raise UploadError("Chunk runs past the declared file size.", offset=upload.received)
+
+        hasher = _hasher_for(upload)
+        with open(part_path(upload), 'r+b') as handle:
+            handle.seek(upload.received)
+            handle.write(data)
+            handle.truncate()
+        hasher.update(data)
+
+        upload.received += len(data)
+        upload.save(update_fields=['received', 'updated_at'])
+        transaction.on_commit(partial(_remember, upload.id, upload.received, hasher))
+    return upload.received
+
+
+def _remember(upload_id, received, hasher):
+    with _hashers_lock:
+        _hashers[upload_id] = (received, hasher)
+
+
+def finalize_upload(upload_id, user, expected_sha256=None):
+    """
+    Turns a fully received upload into a File, the same way the upload form
+    does, and returns it.
+    """
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().filter(
+            id=upload_id, user=user, completed_at__isnull=True
+        ).first()
+        if upload is None:
+            raise UploadError("Upload not found.")
+        if upload.received != upload.size:
+            raise UploadError("Upload is incomplete.", offset=upload.received)
+
+        digest = _hasher_for(upload).hexdigest()
+        if expected_sha256 and expected_sha256.lower() != digest:
+            raise UploadError("Checksum does not match the received data.", offset=upload.received)
+
+        path = part_path(upload)
+        with open(path, 'rb') as handle:
+            file = File(uploader=user, title=upload.title, description=upload.description)
+            file.file.save(upload.filename, DjangoFile(handle), save=False)
+            file.save()
+
+        upload.sha256 = digest
+        upload.file = file
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=['sha256', 'file', 'completed_at', 'updated_at'])
+
+    _discard(upload)
+    log_event(user, 'file_uploaded', target=file, title=file.title)
+    return file
+
+
+def _discard(upload):
+    with _hashers_lock:
+        _hashers.pop(upload.id, None)
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def cleanup_abandoned(older_than=None):
+    """
+    Deletes unfinished uploads untouched for `older_than` and their part
+    files. Returns the number of sessions removed.
+    """
+    if older_than is None:
+        older_than = timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    stale = ChunkedUpload.objects.filter(completed_at__isnull=True, updated_at__lt=timezone.now() - older_than)
+    removed = 0
+    for upload in stale.iterator():
+        _discard(upload)
+        upload.delete()
+        removed += 1
+    return removed
@@ -15,7 +15,14 @@ urlpatterns = [
     path('dashboard/chart-data/', views.chart_data, name='chart_data'),    
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.edit_profile, name='edit_profile'),    
+    path('profile/image/<slug:variant>/', views.profile_image_view, name='profile_image'),
     path('filesupload/', views.file_upload_view, name='file_upload'),
+    path('files/chunked/', views.chunked_upload_start, name='chunked_upload_start'),
+    path('files/chunked/<uuid:upload_id>/', views.chunked_upload_chunk, name='chunked_upload_chunk'),
+    path('files/chunked/<uuid:upload_id>/finalize/', views.chunked_upload_finalize, name='chunked_upload_finalize'),
+    path('files/<int:file_id>/download/', views.file_download_view, name='file_download'),
+    path('files/<int:file_id>/thumbnail/<slug:variant>/', views.file_thumbnail_view, name='file_thumbnail'),
+    path('uploads/<int:file_id>/download/', views.uploaded_file_download_view, name='uploaded_file_download'),
     path('files/edit/<int:file_id>/', views.file_edit_view, name='file_edit'),
     path('files/delete/<int:file_id>/', views.file_delete_view, name='file_delete'),
     path('categories/', views.category_list_view, name='category_list'),
@@ -23,6 +30,8 @@ urlpatterns = [
     path('user_list/', views.user_list_view, name='user_list'),
     path('users/delete/<int:user_id>/', views.delete_user_view, name='delete_user'),
     path('activity-log/', views.activity_log_view, name='activity_log'),
+    path('search/', views.search_view, name='search'),
+    path('exports/<slug:dataset>/', views.export_view, name='export'),
 ]
 
 if settings.DEBUG:
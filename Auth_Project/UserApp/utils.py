@@ -1,7 +1,11 @@
 import hashlib
 from datetime import date
-import random
+import secrets
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 from .models import ActivityLog
+from .audit import activity_writer
 
 def get_daily_passcode():
     today_str = date.today().strftime("%Y-%m-%d")
@@ -9,12 +13,39 @@ def get_daily_passcode():
     return hash_str
 
 def generate_email_otp():
-    return str(random.randint(100000, 999999))
+    return str(secrets.randbelow(900000) + 100000)
 
-def log_activity(user, action):
+def client_ip(request):
     """
-    Logs an activity with the username, role, and timestamp.
+    The caller's address; X-Forwarded-For is only trusted behind a proxy
+    that sets it (TRUST_X_FORWARDED_FOR).
     """
-    role = getattr(user, 'role', 'Anonymous') if user else 'Anonymous'
-    ActivityLog.objects.create(user=user, role=role, action=action)
+    if settings.TRUST_X_FORWARDED_FOR:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
 
+def log_activity(user, action, event='other', target=None, data=None):
+    """
+    Queues an activity entry with the username, role, and timestamp.
+    """
+    authenticated = user is not None and user.is_authenticated
+    activity_writer.submit(ActivityLog(
+        user=user if authenticated else None,
+        role=getattr(user, 'role', 'Anonymous') if authenticated else 'Anonymous',
+        event=event,
+        target_type=ContentType.objects.get_for_model(target) if target is not None else None,
+        target_id=target.pk if target is not None else None,
+        data=data or {},
+        action=action,
+        created_at=timezone.now(),
+    ))
+
+def log_event(user, event, target=None, **data):
+    """
+    Logs one of ActivityLog.EVENT_CHOICES about `target` (any model
+    instance). `data` is stored as JSON and fills in the event's message.
+    """
+    action = ActivityLog.EVENT_MESSAGES[event].format(**data)
+    log_activity(user, action, event=event, target=target, data=data)
@@ -1,104 +1,117 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, logout, get_user_model
+from asgiref.sync import sync_to_async
+from django.contrib.auth import alogin, login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
+from .pagination import CursorPaginator
 from .forms import (
     CustomUserCreationForm,
     CustomAuthenticationForm,
     ForgotPasswordForm,
     ProfileForm,
     FileUploadForm,
-    FileCategoryMappingForm
+    FileCategoryMappingForm,
+    ChunkedUploadInitForm,
+    ActivityLogFilterForm,
+    AssignmentUpdateForm,
 )
-from .models import File, Category, Profile, CustomUser, FileCategoryMapping, FileAccess, ActivityLog
+from .models import File, Category, CustomUser, FileCategoryMapping, ChunkedUpload
 from .decorator import role_required  
 from django.utils import timezone
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
+from .mailer import aenqueue_mail
+from .middleware import get_profile
 from .forms import CustomUserCreationForm
-from .utils import generate_email_otp, get_daily_passcode
-from django.http import JsonResponse
+from . import otp
+from .utils import client_ip, get_daily_passcode, log_event
+from .counters import totals
+from .downloads import serve_file
+from .thumbnails import VARIANTS, serve_thumbnail
+from .permissions import can_view, visible_files
+from .uploads import UploadError, append_chunk, finalize_upload, start_upload
+from .services import reassign_category, set_file_access
+from .queries import acached_upload_chart_data, assignment_page, CHART_WINDOWS
+from .archive import recent_activity
+from .exports import CONTENT_TYPES, DATASETS, export_response
+from .search import SEARCH_RESULTS_PER_PAGE, result_url, search
+from django.http import Http404, JsonResponse
 from .models import UploadedFile, Category
-from django.db.models import Count
 from django.utils import timezone
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_http_methods
 from datetime import timedelta
 
 User = get_user_model()
 
-def log_activity(user, action):
-    ActivityLog.objects.create(
-        user=user if user.is_authenticated else None,
-        role=user.role if user.is_authenticated else "Anonymous",
-        action=action
-    )
-
 def register_page(request):
     form = CustomUserCreationForm()
     context = {
         'form': form,
         'email': request.session.get('email_to_verify', ''),
-        'otp_sent': request.session.get('otp_sent', False),
         'email_verified': request.session.get('email_verified', False),
     }
     return render(request, 'register.html', context)
 
 @require_POST
-def send_otp(request):
-    email = request.POST.get('email', '').strip()
+async def send_otp(request):
+    email = otp.normalize_email(request.POST.get('email', ''))
     if not email:
         return JsonResponse({'status': 'error', 'message': 'Email is required'})
 
-    otp = generate_email_otp()
-    request.session['email_otp'] = otp
-    request.session['email_to_verify'] = email
-    request.session['otp_sent'] = True
-    request.session['email_verified'] = False
-
-    send_mail(
-        'Your OTP Verification Code',
-        f'Your OTP is {otp}',
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=False
-    )
+    if not await otp.acan_send(email, client_ip(request)):
+        return JsonResponse({'status': 'error', 'message': 'Too many OTP requests. Please try again later.'}, status=429)
+
+    code = await otp.aissue(email)
+    await aenqueue_mail('Your OTP Verification Code', f'Your OTP is {code}', [email])
 
     return JsonResponse({'status': 'success', 'message': f'OTP sent to {email}'})
 
 @require_POST
-def verify_otp(request):
+async def verify_otp(request):
+    email = otp.normalize_email(request.POST.get('email', ''))
     otp_input = request.POST.get('otp_input', '').strip()
-    session_otp = request.session.get('email_otp', '')
+    if not email or not otp_input:
+        return JsonResponse({'status': 'error', 'message': 'Email and OTP are required'})
+
+    if not await otp.acan_verify(client_ip(request)):
+        return JsonResponse({'status': 'error', 'message': 'Too many attempts. Please try again later.'}, status=429)
 
-    if otp_input == session_otp:
-        request.session['email_verified'] = True
+    result = await otp.acheck(email, otp_input)
+    if result == otp.VERIFIED:
+        # The only session write in the OTP flow.
+        await request.session.aupdate({'email_to_verify': email, 'email_verified': True})
         return JsonResponse({'status': 'success', 'message': 'Email verified successfully!'})
-    else:
+    if result == otp.INVALID:
         return JsonResponse({'status': 'error', 'message': 'Invalid OTP'})
+    if result == otp.LOCKED:
+        return JsonResponse({'status': 'error', 'message': 'Too many wrong attempts. Please request a new OTP.'})
+    return JsonResponse({'status': 'error', 'message': 'OTP expired. Please request a new one.'})
 
 @require_POST
-def register_submit(request):
-    email_verified = request.session.get('email_verified', False)
+async def register_submit(request):
+    email_verified = await request.session.aget('email_verified', False)
     form = CustomUserCreationForm(request.POST)
 
-    if not email_verified:
+    verified_email = await request.session.aget('email_to_verify', '')
+    if not email_verified or otp.normalize_email(request.POST.get('email', '')) != verified_email:
         return JsonResponse({'status': 'error', 'errors': {'email': ['Email must be verified']}})
 
-    if form.is_valid():
+    # Validation queries the database and save() runs the password hasher,
+    # so both go to a worker thread rather than blocking the event loop.
+    if await sync_to_async(form.is_valid)():
         role = form.cleaned_data.get('role')
         passcode = form.cleaned_data.get('passcode')
 
         if role in ['admin', 'manager'] and passcode != get_daily_passcode():
             return JsonResponse({'status': 'error', 'errors': {'passcode': ['Invalid passcode for selected role']}})
 
-        user = form.save()
-        login(request, user)
-        log_activity(user, f"Registered new user with role: {user.role}")
+        user = await sync_to_async(form.save)()
+        await alogin(request, user)
+        await sync_to_async(log_event)(user, 'registered', target=user, role=user.role)
 
-        for key in ['email_verified', 'email_otp', 'email_to_verify', 'otp_sent']:
-            request.session.pop(key, None)
+        for key in ['email_verified', 'email_to_verify']:
+            await request.session.apop(key, None)
 
         return JsonResponse({'status': 'success', 'redirect': '/dashboard/'})
 
@@ -111,7 +124,7 @@ def login_view(request):
         if form.is_valid():
             user = form.get_user()
             login(request, user)
-            log_activity(user, "Logged in")
+            log_event(user, 'login')
             return redirect('dashboard')
     else:
         form = CustomAuthenticationForm()
@@ -130,7 +143,7 @@ def forgot_password_view(request):
                 user = User.objects.get(username=username)
                 user.set_password(new_password)
                 user.save()
-                log_activity(user, "Password reset")
+                log_event(user, 'password_reset', target=user)
                 messages.success(request, "Password reset successful! Please log in with your new password.")
                 return redirect('login')
             except User.DoesNotExist:
@@ -144,43 +157,31 @@ User = get_user_model()
 
 @login_required
 def dashboard(request):
-    recent_files = UploadedFile.objects.order_by('-uploaded_at')[:5]
-    total_files = UploadedFile.objects.count()
-    total_categories = Category.objects.count()
-    total_users = User.objects.count()
-    
+    recent_files = UploadedFile.objects.select_related('category').order_by('-uploaded_at')[:5]
+    counts = totals('uploadedfile', 'category', 'user')
+
     context = {
         "recent_files": recent_files,
-        "total_files": total_files,
-        "total_categories": total_categories,
-        "total_users": total_users,
+        "total_files": counts['uploadedfile'],
+        "total_categories": counts['category'],
+        "total_users": counts['user'],
     }
     return render(request, "dashboard.html", context)
 
 @login_required
-def chart_data(request):
-    from django.utils import timezone
-    from datetime import timedelta
-
-    today = timezone.now().date()
-    dates = [today - timedelta(days=i) for i in range(6, -1, -1)]
-    upload_counts = [UploadedFile.objects.filter(uploaded_at__date=d).count() for d in dates]
-    upload_dates = [d.strftime("%b %d") for d in dates]
-
-    categories = Category.objects.annotate(count=Count('files'))
-    category_names = [c.name for c in categories]
-    category_counts = [c.count for c in categories]
+async def chart_data(request):
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        days = 7
+    if days not in CHART_WINDOWS:
+        days = 7
 
-    return JsonResponse({
-        "upload_dates": upload_dates,
-        "upload_counts": upload_counts,
-        "category_names": category_names,
-        "category_counts": category_counts
-    })
+    return JsonResponse(await acached_upload_chart_data(days))
 
 @login_required
 def profile_view(request):
-    profile, created = Profile.objects.get_or_create(user=request.user)
+    profile = get_profile(request.user)
     current_date = timezone.now().strftime('%a, %d %B %Y')
 
     context = {
@@ -189,15 +190,22 @@ def profile_view(request):
     }
     return render(request, 'profile.html', context)
 
+@login_required
+def profile_image_view(request, variant):
+    profile = get_profile(request.user)
+    if variant not in VARIANTS or not profile.profile_image:
+        raise Http404("Image not found.")
+    return serve_thumbnail(request, profile.profile_image, variant)
+
 @login_required
 def edit_profile(request):
-    profile, created = Profile.objects.get_or_create(user=request.user)
+    profile = get_profile(request.user)
 
     if request.method == 'POST':
         form = ProfileForm(request.POST, request.FILES, instance=profile)
         if form.is_valid():
             form.save()
-            log_activity(request.user, "Updated profile")
+            log_event(request.user, 'profile_updated', target=profile)
             return redirect('profile') 
     else:
         form = ProfileForm(instance=profile)
@@ -213,26 +221,93 @@ def file_upload_view(request):
             file = form.save(commit=False)
             file.uploader = request.user
             file.save()
-            log_activity(request.user, f"Uploaded file: {file.title}")
+            log_event(request.user, 'file_uploaded', target=file, title=file.title)
             messages.success(request, "File uploaded successfully!")
             return redirect('file_upload')
     else:
         form = FileUploadForm()
 
-    if request.user.role == 'admin':
-        file_list = File.objects.all().order_by('-uploaded_at')
-    elif request.user.role == 'manager':
-        file_list = File.objects.filter(uploader__role='employee').order_by('-uploaded_at')
-    else:
-        file_list = File.objects.filter(uploader=request.user).order_by('-uploaded_at')
-
-    paginator = Paginator(file_list, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    file_list = visible_files(request.user)
+    paginator = CursorPaginator(file_list.select_related('uploader', 'updated_by'), ('-uploaded_at', '-id'), 5)
+    page_obj = paginator.get_page_from_request(request)
 
     context = {'form': form, 'page_obj': page_obj}
     return render(request, 'file_upload.html', context)
 
+@login_required
+def file_download_view(request, file_id):
+    file = get_object_or_404(File, id=file_id)
+    if not can_view(request.user, file):
+        raise Http404("File not found.")
+    return serve_file(request, file.file)
+
+@login_required
+def file_thumbnail_view(request, file_id, variant):
+    file = get_object_or_404(File, id=file_id)
+    if variant not in VARIANTS or not can_view(request.user, file):
+        raise Http404("File not found.")
+    return serve_thumbnail(request, file.file, variant)
+
+@login_required
+def uploaded_file_download_view(request, file_id):
+    uploaded = get_object_or_404(UploadedFile, id=file_id)
+    return serve_file(request, uploaded.file)
+
+@login_required
+@require_POST
+def chunked_upload_start(request):
+    form = ChunkedUploadInitForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+
+    upload = start_upload(
+        request.user,
+        title=form.cleaned_data['title'],
+        description=form.cleaned_data['description'],
+        filename=form.cleaned_data['filename'],
+        size=form.cleaned_data['size'],
+    )
+    return JsonResponse({
+        'status': 'success',
+        'upload_id': str(upload.id),
+        'offset': 0,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }, status=201)
+
+@login_required
+@require_http_methods(['GET', 'PUT'])
+def chunked_upload_chunk(request, upload_id):
+    if request.method == 'GET':
+        upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user, completed_at__isnull=True)
+        return JsonResponse({'status': 'success', 'offset': upload.received, 'size': upload.size})
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.GET.get('offset', '')))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Upload-Offset is required'}, status=400)
+
+    # Read the stream directly: request.body enforces DATA_UPLOAD_MAX_MEMORY_SIZE.
+    data = request.read(settings.CHUNKED_UPLOAD_CHUNK_SIZE + 1)
+    if len(data) > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        return JsonResponse({'status': 'error', 'message': 'Chunk is too large'}, status=413)
+
+    try:
+        received = append_chunk(upload_id, request.user, offset, data)
+    except UploadError as exc:
+        status = 404 if exc.offset is None else 409
+        return JsonResponse({'status': 'error', 'message': str(exc), 'offset': exc.offset}, status=status)
+    return JsonResponse({'status': 'success', 'offset': received})
+
+@login_required
+@require_POST
+def chunked_upload_finalize(request, upload_id):
+    try:
+        file = finalize_upload(upload_id, request.user, request.POST.get('sha256'))
+    except UploadError as exc:
+        status = 404 if exc.offset is None else 409
+        return JsonResponse({'status': 'error', 'message': str(exc), 'offset': exc.offset}, status=status)
+    return JsonResponse({'status': 'success', 'file_id': file.id})
+
 @login_required
 @role_required(['manager', 'admin'])
 def file_edit_view(request, file_id):
@@ -244,7 +319,7 @@ def file_edit_view(request, file_id):
             file = form.save(commit=False)
             file.updated_by = request.user
             file.save()
-            log_activity(request.user, f"Edited file: {file.title}")
+            log_event(request.user, 'file_edited', target=file, title=file.title)
             messages.success(request, "File updated successfully!")
             return redirect('file_upload')
 
@@ -255,9 +330,8 @@ def file_edit_view(request, file_id):
 def file_delete_view(request, file_id):
     try:
         file = File.objects.get(id=file_id)
-        file_title = file.title
+        log_event(request.user, 'file_deleted', target=file, title=file.title)
         file.delete()
-        log_activity(request.user, f"Deleted file: {file_title}")
         messages.success(request, "File deleted successfully!")
     except File.DoesNotExist:
         messages.error(request, "File not found.")
@@ -267,32 +341,45 @@ def file_delete_view(request, file_id):
 @role_required(['admin', 'manager'])
 def category_list_view(request):
     categories = Category.objects.all().order_by('name')
-    assignments = FileCategoryMapping.objects.select_related('file', 'category', 'assigned_by').order_by('-assigned_at')
     users = CustomUser.objects.filter(role='employee').order_by('username')  # 👈 Add this line
 
     if request.method == 'POST':
         assignment_id = request.POST.get('assignment_id')
+        bulk_category_id = request.POST.get('bulk_category')
+
+        update = AssignmentUpdateForm(request.POST)
+        if (bulk_category_id or assignment_id) and not update.is_valid():
+            messages.error(request, update.error_text())
+            return redirect('category_list')
+
+        if bulk_category_id:
+            category = get_object_or_404(Category, id=bulk_category_id)
+            user_ids = [user.pk for user in update.cleaned_data['assign_to']]
+            if not user_ids:
+                messages.error(request, "Select at least one user to reassign the category to.")
+                return redirect('category_list')
+
+            file_count, _ = reassign_category(category, user_ids, request.user)
+            log_event(request.user, 'category_reassigned', target=category,
+                      category=category.name, files=file_count, users=len(user_ids))
+            messages.success(request, f"Reassigned {file_count} files in '{category.name}'.")
+            return redirect('category_list')
 
-        if assignment_id:
+        elif assignment_id:
             mapping = get_object_or_404(FileCategoryMapping, id=assignment_id)
-            new_category_id = request.POST.get('category')
-            new_assign_to_ids = request.POST.getlist('assign_to')
+            new_category = update.cleaned_data['category']
+            new_assign_to_ids = [user.pk for user in update.cleaned_data['assign_to']]
 
-            if new_category_id and str(mapping.category.id) != new_category_id:
-                mapping.category_id = new_category_id
+            if new_category:
+                mapping.category = new_category
 
-            if new_assign_to_ids:
-                FileAccess.objects.filter(file=mapping.file).delete()
-                for uid in new_assign_to_ids:
-                    FileAccess.objects.update_or_create(
-                        file=mapping.file,
-                        user_id=uid,
-                        defaults={'can_view': True, 'can_edit': False}
-                    )
+            with transaction.atomic():
+                if new_assign_to_ids:
+                    set_file_access([mapping.file_id], new_assign_to_ids, replace=True)
 
-            mapping.reassigned_by = request.user
-            mapping.reassigned_at = timezone.now()
-            mapping.save()
+                mapping.reassigned_by = request.user
+                mapping.reassigned_at = timezone.now()
+                mapping.save()
 
             messages.success(request, "Reassignment updated successfully.")
             return redirect('category_list')
@@ -300,20 +387,16 @@ def category_list_view(request):
         else:
             form = FileCategoryMappingForm(request.POST)
             if form.is_valid():
-                mapping = form.save(commit=False)
-                mapping.assigned_by = request.user
-                mapping.save()
-
                 assigned_users = form.cleaned_data.get('assign_to')
-                if assigned_users:
-                    if not hasattr(assigned_users, '__iter__'):
-                        assigned_users = [assigned_users]
-                    for user in assigned_users:
-                        FileAccess.objects.update_or_create(
-                            file=mapping.file,
-                            user=user,
-                            defaults={'can_view': True, 'can_edit': False}
-                        )
+                if assigned_users and not hasattr(assigned_users, '__iter__'):
+                    assigned_users = [assigned_users]
+
+                with transaction.atomic():
+                    mapping = form.save(commit=False)
+                    mapping.assigned_by = request.user
+                    mapping.save()
+                    if assigned_users:
+                        set_file_access([mapping.file_id], [user.pk for user in assigned_users], replace=False)
 
                 messages.success(request, "File successfully assigned to category and users!")
                 return redirect('category_list')
@@ -322,7 +405,8 @@ def category_list_view(request):
 
     context = {
         'categories': categories,
-        'assignments': assignments,
+        # Built only here: every successful POST redirects instead.
+        'assignments': assignment_page(request),
         'form': form,
         'users': users,
     }
@@ -332,7 +416,8 @@ def category_list_view(request):
 @role_required(['admin', 'manager'])
 def delete_assignment_view(request, assignment_id):
     assignment = get_object_or_404(FileCategoryMapping, id=assignment_id)
-    log_activity(request.user, f"Deleted assignment of file '{assignment.file.title}' to category '{assignment.category.name}'")
+    log_event(request.user, 'assignment_deleted', target=assignment.file,
+              title=assignment.file.title, category=assignment.category.name)
     assignment.delete()
     messages.success(request, f"Assignment of '{assignment.file.title}' to '{assignment.category.name}' deleted successfully.")
     return redirect('category_list')
@@ -340,11 +425,8 @@ def delete_assignment_view(request, assignment_id):
 @login_required
 @role_required(['admin', 'manager'])
 def user_list_view(request):
-    users = CustomUser.objects.all().order_by('username')
-
-    paginator = Paginator(users, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(CustomUser.objects.all(), ('username', 'id'), 5)
+    page_obj = paginator.get_page_from_request(request)
 
     now = timezone.now()
     seven_days_ago = now - timedelta(days=7)
@@ -365,7 +447,7 @@ def delete_user_view(request, user_id):
     if user_to_delete == request.user:
         messages.error(request, "You cannot delete yourself.")
         return redirect('user_list')
-    log_activity(request.user, f"Deleted user: {user_to_delete.username}")
+    log_event(request.user, 'user_deleted', target=user_to_delete, username=user_to_delete.username)
     user_to_delete.delete()
     messages.success(request, f"User {user_to_delete.username} has been deleted.")
     return redirect('user_list')
@@ -374,19 +456,56 @@ def delete_user_view(request, user_id):
 @role_required(['admin'])
 def activity_log_view(request):
 
-    logs = ActivityLog.objects.all().order_by('-created_at') 
+    form = ActivityLogFilterForm(request.GET)
+    logs = form.filter(recent_activity()).select_related('user')
 
-    paginator = Paginator(logs, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(logs, ('-created_at', '-id'), 20)
+    page_obj = paginator.get_page_from_request(request)
+
+    # Keep the filters on the Previous/Next links.
+    filters = request.GET.copy()
+    filters.pop('cursor', None)
+    filters.pop('page', None)
 
     context = {
         'page_obj': page_obj,
+        'form': form,
+        'filter_query': filters.urlencode(),
     }
     return render(request, 'activity_log.html', context)
 
+@login_required
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    paginator = CursorPaginator(search(request.user, query), ('-rank', '-id'), SEARCH_RESULTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    results = [
+        {
+            'kind': document.kind,
+            'id': document.object_id,
+            'title': document.title,
+            'url': result_url(document),
+            'rank': document.rank,
+        }
+        for document in page_obj
+    ]
+    return JsonResponse({
+        'query': query,
+        'results': results,
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+    })
+
+@login_required
+@role_required(['admin'])
+def export_view(request, dataset):
+    fmt = request.GET.get('format', 'csv')
+    if dataset not in DATASETS or fmt not in CONTENT_TYPES:
+        raise Http404("Unknown export.")
+    return export_response(request, dataset, fmt)
+
 def logout_view(request):
     if request.user.is_authenticated:
-        log_activity(request.user, "Logged out")
+        log_event(request.user, 'logout')
     logout(request)
     return redirect('login')
@@ -0,0 +1,85 @@
+"""
+Seeds a throwaway database with --logs activity entries spread over users,
+event types and file targets, then prints the query plan and mean latency
+of each activity_log_view filter (first page of 21 rows).
+
+    python -m benchmarks.activity_filters --logs 1000000
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks.common import setup_django, timed
+
+
+def seed(logs, users, files):
+    from django.contrib.contenttypes.models import ContentType
+    from django.utils import timezone
+    from UserApp.models import ActivityLog, CustomUser, File
+
+    rng = random.Random(0)
+    now = timezone.now()
+    CustomUser.objects.bulk_create(
+        [CustomUser(username=f'user{i}', email=f'user{i}@example.com', password='!') for i in range(users)],
+        batch_size=1000,
+    )
+    user_ids = list(CustomUser.objects.values_list('id', flat=True))
+    File.objects.bulk_create(
+        [File(uploader_id=rng.choice(user_ids), title=f'file {i}', file=f'uploads/file{i}.txt') for i in range(files)],
+        batch_size=1000,
+    )
+    file_ids = list(File.objects.values_list('id', flat=True))
+    file_type = ContentType.objects.get_for_model(File)
+    events = [event for event, _ in ActivityLog.EVENT_CHOICES]
+    for start in range(0, logs, 20000):
+        batch = []
+        for i in range(start, min(start + 20000, logs)):
+            event = rng.choice(events)
+            on_file = event.startswith('file_')
+            batch.append(ActivityLog(
+                user_id=rng.choice(user_ids), role='employee', event=event, action=event,
+                target_type=file_type if on_file else None, target_id=rng.choice(file_ids) if on_file else None,
+                created_at=now - timedelta(seconds=i * 5),
+            ))
+        ActivityLog.objects.bulk_create(batch, batch_size=2000)
+    return user_ids, file_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.utils import timezone
+    from UserApp.archive import recent_activity
+    from UserApp.forms import ActivityLogFilterForm
+
+    call_command('migrate', verbosity=0)
+    user_ids, file_ids = seed(args.logs, args.users, args.files)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    today = timezone.localdate()
+    filters = {
+        'no filter': {},
+        'user': {'user': 'user7'},
+        'event': {'event': 'user_deleted'},
+        'target': {'target_type': 'file', 'target_id': file_ids[0]},
+        'time range': {'since': (today - timedelta(days=30)).isoformat(), 'until': (today - timedelta(days=20)).isoformat()},
+        'user + event': {'user': 'user7', 'event': 'login'},
+    }
+    for name, data in filters.items():
+        queryset = ActivityLogFilterForm(data).filter(recent_activity()).select_related('user').order_by('-created_at', '-id')[:21]
+        ms = timed(lambda: list(queryset.all()), args.repeat)
+        print(f"\n{name}: {ms:.3f} ms")
+        print('  ' + queryset.explain().replace('\n', '\n  '))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Starts the project under gunicorn (WSGI, sync threads) and uvicorn (ASGI),
+one after the other on a local port, and drives the same concurrent load
+at each: authenticated GETs of /dashboard/chart-data/ with the chart cache disabled,
+so every request waits on the database.
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 64 --seconds 15 --workers 1
+
+Needs gunicorn and uvicorn on PATH (both are in requirements.txt).
+"""
+import argparse
+import http.client
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import setup_django
+
+PORT = 8765
+
+
+def seed():
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.core.management import call_command
+    from importlib import import_module
+    from UserApp.models import Category, CustomUser
+
+    call_command('migrate', verbosity=0)
+    Category.objects.bulk_create([Category(name=f'cat {i}') for i in range(20)])
+    user = CustomUser.objects.create_user(username='bench', password='bench-password', role='admin')
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+def wait_for_port(process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with {process.returncode}")
+        try:
+            http.client.HTTPConnection('127.0.0.1', PORT, timeout=1).connect()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit("server did not start")
+
+
+def load(cookie, concurrency, seconds):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+        windows = ['7', '30', '90']
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', f'/dashboard/chart-data/?days={windows[i % 3]}', headers={'Cookie': cookie})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+                ok = False
+            with lock:
+                (latencies if ok else errors).append(time.perf_counter() - start)
+            i += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--workers', type=int, default=1, help="Server processes.")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker.")
+    args = parser.parse_args()
+
+    servers = {
+        'wsgi (gunicorn)': ['gunicorn', 'Auth_Project.wsgi:application', '--bind', f'127.0.0.1:{PORT}',
+                            '--workers', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning'],
+        'asgi (uvicorn)': ['uvicorn', 'Auth_Project.asgi:application', '--port', str(PORT),
+                           '--workers', str(args.workers), '--log-level', 'warning'],
+    }
+    missing = [command[0] for command in servers.values() if not shutil.which(command[0])]
+    if missing:
+        raise SystemExit(f"not installed: {', '.join(missing)}")
+
+    path = setup_django()
+    cookie = seed()
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.server_settings', BENCHMARK_DATABASE=path)
+
+    print(f"{args.concurrency} clients, {args.seconds:g}s, {args.workers} worker(s)")
+    print(f"{'server':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for name, command in servers.items():
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=sys.stderr)
+        try:
+            wait_for_port(process)
+            latencies, errors = load(cookie, args.concurrency, args.seconds)
+        finally:
+            process.terminate()
+            process.wait()
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        print(f"{name:<18}{len(latencies) / args.seconds:>9.1f}{p50:>9.1f}{p95:>9.1f}{len(errors):>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Shared bootstrap for the scripts in this package. Each benchmark runs
+against a throwaway SQLite file so the project database is never touched:
+
+    python -m benchmarks.<name> [options]
+
+run from the directory containing manage.py.
+"""
+import os
+import tempfile
+import time
+
+import django
+
+
+def setup_django(database=None):
+    """
+    Configures Django against `database` (a DATABASES entry) or a fresh
+    temporary SQLite file, and returns the database path or name used.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Auth_Project.settings')
+    from django.conf import settings
+
+    if database is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='userapp-bench-'), 'bench.sqlite3')
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    settings.DATABASES['default'] = database
+    settings.ACTIVITY_LOG_ASYNC = False
+    django.setup()
+    return database['NAME']
+
+
+def timed(func, repeat=50):
+    """
+    Runs `func` `repeat` times and returns the mean wall time in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
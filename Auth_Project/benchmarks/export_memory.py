@@ -0,0 +1,59 @@
+"""
+Peak Python memory (tracemalloc) and throughput of the streaming activity
+log export at growing table sizes. The peak should stay flat as --sizes
+grow, since rows are read EXPORT_CHUNK_SIZE at a time.
+
+    python -m benchmarks.export_memory --sizes 1000 100000 1000000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks.common import setup_django
+
+
+def grow_to(size):
+    from django.utils import timezone
+    from UserApp.models import ActivityLog, CustomUser
+
+    user = CustomUser.objects.get_or_create(username='bench', defaults={'role': 'admin'})[0]
+    now = timezone.now()
+    existing = ActivityLog.objects.count()
+    for start in range(existing, size, 20000):
+        ActivityLog.objects.bulk_create(
+            [ActivityLog(user=user, role='admin', event='login', action='Logged in',
+                         created_at=now - timedelta(seconds=i)) for i in range(start, min(start + 20000, size))],
+            batch_size=2000,
+        )
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.test import RequestFactory
+    from UserApp.exports import export_response
+
+    call_command('migrate', verbosity=0)
+    print(f"{'rows':>10}{'MB/s':>10}{'peak KiB':>12}")
+    for size in sorted(args.sizes):
+        user = grow_to(size)
+        request = RequestFactory().get('/', {'format': args.format})
+        request.user = user
+        tracemalloc.start()
+        start = time.perf_counter()
+        sent = sum(len(chunk) for chunk in export_response(request, 'activity', args.format).streaming_content)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{size:>10}{sent / elapsed / 1e6:>10.1f}{peak / 1024:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Seeds a throwaway database at the current schema, then prints the query
+plan and mean latency of the app's hot queries without and with the indexes
+added by the 0014_access_path_indexes migration, which are dropped and
+recreated in place.
+
+    python -m benchmarks.index_plans --users 2000 --files 20000 --logs 200000
+"""
+import argparse
+import importlib
+import random
+from datetime import timedelta
+
+from benchmarks.common import setup_django, timed
+
+MIGRATION = '0014_access_path_indexes'
+
+
+def seed(users, files, logs):
+    from django.utils import timezone
+    from UserApp.models import ActivityLog, Category, CustomUser, File, FileAccess, FileCategoryMapping
+
+    now = timezone.now()
+    roles = ['employee'] * 8 + ['manager', 'admin']
+    CustomUser.objects.bulk_create(
+        [CustomUser(username=f'user{i}', email=f'user{i}@example.com', role=random.choice(roles), password='!')
+         for i in range(users)],
+        batch_size=1000,
+    )
+    user_ids = list(CustomUser.objects.values_list('id', flat=True))
+    category = Category.objects.create(name='Bench')
+
+    File.objects.bulk_create(
+        [File(uploader_id=random.choice(user_ids), title=f'file {i}', file=f'uploads/file{i}.txt',
+              uploaded_at=now - timedelta(minutes=i)) for i in range(files)],
+        batch_size=1000,
+    )
+    file_ids = list(File.objects.values_list('id', flat=True))
+    FileCategoryMapping.objects.bulk_create(
+        [FileCategoryMapping(file_id=fid, category=category) for fid in file_ids],
+        batch_size=1000,
+    )
+    FileAccess.objects.bulk_create(
+        [FileAccess(file_id=fid, user_id=random.choice(user_ids)) for fid in file_ids],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    ActivityLog.objects.bulk_create(
+        [ActivityLog(user_id=random.choice(user_ids), role='employee', action=f'event {i}',
+                     created_at=now - timedelta(seconds=i)) for i in range(logs)],
+        batch_size=2000,
+    )
+    return user_ids, file_ids
+
+
+def hot_queries(user_ids, file_ids):
+    from UserApp.models import ActivityLog, CustomUser, File, FileAccess, FileCategoryMapping
+
+    return {
+        'activity log page': ActivityLog.objects.order_by('-created_at', '-id')[:21],
+        'admin file list': File.objects.order_by('-uploaded_at', '-id')[:6],
+        'employee file list': File.objects.filter(uploader_id=user_ids[0]).order_by('-uploaded_at', '-id')[:6],
+        'manager file list': File.objects.filter(uploader__role='employee').order_by('-uploaded_at', '-id')[:6],
+        'assignment page': FileCategoryMapping.objects.order_by('-assigned_at', '-id')[:21],
+        'access by file+user': FileAccess.objects.filter(file_id=file_ids[0], user_id=user_ids[0]),
+        'access by user': FileAccess.objects.filter(user_id=user_ids[0]).values_list('file_id', flat=True),
+        'email lookup': CustomUser.objects.filter(email='user7@example.com'),
+    }
+
+
+def access_path_indexes():
+    """
+    (model, AddIndex or AddConstraint operation) for each index 0014 added.
+    """
+    from django.apps import apps
+    from django.db import migrations
+
+    module = importlib.import_module(f'UserApp.migrations.{MIGRATION}')
+    return [
+        (apps.get_model('UserApp', op.model_name), op)
+        for op in module.Migration.operations
+        if isinstance(op, (migrations.AddIndex, migrations.AddConstraint))
+    ]
+
+
+def toggle_indexes(present):
+    """
+    Drops (or recreates) the 0014 indexes. Constraints go first: SQLite
+    rebuilds the table to change them, which recreates the model's indexes,
+    so each index is checked before it is touched.
+    """
+    from django.db import connection, migrations
+
+    operations = sorted(access_path_indexes(), key=lambda pair: isinstance(pair[1], migrations.AddIndex))
+    with connection.schema_editor() as editor:
+        for model, op in operations:
+            with connection.cursor() as cursor:
+                existing = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            if isinstance(op, migrations.AddIndex):
+                if (op.index.name in existing) != present:
+                    (editor.add_index if present else editor.remove_index)(model, op.index)
+            elif (op.constraint.name in existing) != present:
+                (editor.add_constraint if present else editor.remove_constraint)(model, op.constraint)
+
+
+def report(label, queries):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f"\n=== {label} ===")
+    for name, queryset in queries.items():
+        ms = timed(lambda: list(queryset.all()), repeat=20)
+        print(f"\n{name}: {ms:.3f} ms")
+        print('  ' + queryset.explain().replace('\n', '\n  '))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--logs', type=int, default=200000)
+    args = parser.parse_args()
+
+    path = setup_django()
+    from django.core.management import call_command
+
+    print(f"Seeding {path}")
+    call_command('migrate', verbosity=0)
+    user_ids, file_ids = seed(args.users, args.files, args.logs)
+
+    toggle_indexes(present=False)
+    report(f"without the {MIGRATION} indexes", hot_queries(user_ids, file_ids))
+
+    toggle_indexes(present=True)
+    report(f"with the {MIGRATION} indexes", hot_queries(user_ids, file_ids))
+
+
+if __name__ == '__main__':
+    main()
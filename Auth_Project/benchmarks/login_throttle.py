@@ -0,0 +1,53 @@
+"""
+Measures what a login attempt costs with the real password hasher: a wrong
+password that runs PBKDF2, against an attempt rejected by the lockout
+before the hasher is reached.
+
+    python -m benchmarks.login_throttle --repeat 50
+"""
+import argparse
+
+from benchmarks.common import setup_django, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.test import RequestFactory
+    from UserApp.forms import CustomAuthenticationForm
+    from UserApp.models import CustomUser
+
+    call_command('migrate', verbosity=0)
+    CustomUser.objects.create_user(username='alice', password='right-password')
+    factory = RequestFactory()
+    data = {'username': 'alice', 'password': 'wrong-password'}
+
+    def attempt():
+        request = factory.post('/', data)
+        CustomAuthenticationForm(request, data=data).is_valid()
+
+    # Unthrottled: lift the limits so every attempt reaches the hasher.
+    limits = settings.LOGIN_FAILURE_LIMIT
+    settings.LOGIN_FAILURE_LIMIT = {scope: 10 ** 9 for scope in limits}
+    hashed = timed(attempt, args.repeat)
+
+    settings.LOGIN_FAILURE_LIMIT = limits
+    cache.clear()
+    for _ in range(limits['login-user']):
+        attempt()
+    rejected = timed(attempt, args.repeat)
+
+    print(f"hasher: {settings.PASSWORD_HASHERS[0].rsplit('.', 1)[-1]}")
+    print(f"failed attempt (hashed):    {hashed * 1000:10.1f} us")
+    print(f"locked attempt (rejected):  {rejected * 1000:10.1f} us")
+    print(f"speedup: {hashed / rejected:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
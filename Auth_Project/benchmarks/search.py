@@ -0,0 +1,130 @@
+"""
+Seeds a throwaway database with --logs activity log entries (plus files and
+categories), builds the search index, then compares the /search/ query
+(FTS5 on SQLite) with the icontains scan it replaces, for an admin and an
+employee. Finally measures what indexing adds to each activity log write,
+batched (the writer thread) and inline (a save inside a transaction).
+
+    python -m benchmarks.search --logs 1000000 --files 50000
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+from unittest import mock
+
+from benchmarks.common import setup_django, timed
+
+WORDS = ('invoice', 'report', 'payroll', 'upload', 'deleted', 'category', 'contract', 'budget',
+         'review', 'quarterly', 'holiday', 'policy', 'training', 'expense', 'audit', 'roadmap')
+# A long tail of rarer words, so only common words match a large share of rows.
+RARE_WORDS = tuple(f'term{i}' for i in range(20000))
+QUERIES = ('payroll', 'quarterly budget', 'rev', 'term1234', 'nonexistent')
+
+
+def phrase(rng, n=4):
+    return ' '.join(rng.choice(WORDS if rng.random() < 0.2 else RARE_WORDS) for _ in range(n))
+
+
+def seed(logs, files):
+    from django.utils import timezone
+    from UserApp.models import ActivityLog, Category, CustomUser, File
+
+    rng = random.Random(0)
+    now = timezone.now()
+    CustomUser.objects.bulk_create(
+        [CustomUser(username=f'user{i}', email=f'user{i}@example.com',
+                    role='admin' if i == 0 else 'employee', password='!') for i in range(100)],
+        batch_size=1000,
+    )
+    user_ids = list(CustomUser.objects.values_list('id', flat=True))
+    Category.objects.bulk_create([Category(name=phrase(rng, 2), description=phrase(rng, 8)) for _ in range(200)])
+    File.objects.bulk_create(
+        [File(uploader_id=rng.choice(user_ids), title=phrase(rng, 3), description=phrase(rng, 10),
+              file=f'uploads/file{i}.txt', uploaded_at=now - timedelta(minutes=i)) for i in range(files)],
+        batch_size=2000,
+    )
+    for start in range(0, logs, 20000):
+        ActivityLog.objects.bulk_create(
+            [ActivityLog(user_id=rng.choice(user_ids), role='employee', action=phrase(rng, 6),
+                         created_at=now - timedelta(seconds=i)) for i in range(start, min(start + 20000, logs))],
+            batch_size=2000,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, default=1000000)
+    parser.add_argument('--files', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db.models import Q
+    from UserApp.models import ActivityLog, CustomUser
+    from UserApp.permissions import visible_files
+    from UserApp.search import SEARCH_RESULTS_PER_PAGE, rebuild, search
+
+    call_command('migrate', verbosity=0)
+    start = time.perf_counter()
+    seed(args.logs, args.files)
+    print(f"seeded {args.logs} log entries and {args.files} files in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    count = rebuild()
+    print(f"indexed {count} documents in {time.perf_counter() - start:.1f}s")
+
+    users = {
+        'admin': CustomUser.objects.get(username='user0'),
+        'employee': CustomUser.objects.get(username='user1'),
+    }
+    print(f"\n{'query':<20}{'user':<10}{'fts ms':>10}{'icontains ms':>14}")
+    for query in QUERIES:
+        for label, user in users.items():
+            fts = timed(lambda: list(search(user, query).order_by('-rank', '-id')[:SEARCH_RESULTS_PER_PAGE + 1]),
+                        args.repeat)
+
+            def scan():
+                # What a search over the source tables looks like without an index.
+                terms = query.split()
+                files = visible_files(user)
+                logs = ActivityLog.objects.all() if label == 'admin' else ActivityLog.objects.none()
+                for term in terms:
+                    files = files.filter(Q(title__icontains=term) | Q(description__icontains=term))
+                    logs = logs.filter(action__icontains=term)
+                list(files.order_by('-uploaded_at', '-id')[:SEARCH_RESULTS_PER_PAGE + 1])
+                list(logs.order_by('-created_at', '-id')[:SEARCH_RESULTS_PER_PAGE + 1])
+
+            print(f"{query:<20}{label:<10}{fts:>10.2f}{timed(scan, args.repeat):>14.2f}")
+
+    write_costs(users['employee'], args.repeat)
+
+
+def write_costs(user, repeat, batch_size=100):
+    from django.db import transaction
+    from UserApp.audit import ActivityLogWriter
+    from UserApp.models import ActivityLog
+
+    rng = random.Random(1)
+    writer = ActivityLogWriter(batch_size=batch_size)
+
+    def batched():
+        writer._write([ActivityLog(user=user, role=user.role, action=phrase(rng, 6)) for _ in range(batch_size)])
+
+    def inline():
+        with transaction.atomic():
+            ActivityLog.objects.create(user=user, role=user.role, action=phrase(rng, 6))
+
+    print(f"\n{'activity log write':<20}{'indexed ms':>12}{'unindexed ms':>14}  (per entry)")
+    indexed = timed(batched, repeat) / batch_size
+    with mock.patch('UserApp.audit.index_for_search'):
+        unindexed = timed(batched, repeat) / batch_size
+    print(f"{'batched':<20}{indexed:>12.3f}{unindexed:>14.3f}")
+    indexed = timed(inline, repeat * 10)
+    with mock.patch('UserApp.signals.index_for_search'):
+        unindexed = timed(inline, repeat * 10)
+    print(f"{'inline':<20}{indexed:>12.3f}{unindexed:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+"""
+Settings for the servers started by benchmarks.asgi_vs_wsgi: the project
+settings pointed at the benchmark's throwaway SQLite file.
+"""
+import os
+
+from Auth_Project.settings import *  # noqa: F401,F403
+from Auth_Project.settings import SQLITE_OPTIONS
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BENCHMARK_DATABASE'],
+        'OPTIONS': SQLITE_OPTIONS,
+    }
+}
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+# Make every chart request run its GROUP BY queries instead of hitting the cache.
+CHART_CACHE_TIMEOUT = 0
@@ -0,0 +1,64 @@
+"""
+Per-request session overhead for each SESSION_MODE: loading an existing
+logged-in session (every authenticated request), and saving an anonymous
+session that was changed (the OTP/registration steps).
+
+    python -m benchmarks.session_modes --repeat 500
+
+cached_db is measured against the configured default cache; without
+REDIS_URL that is LocMemCache, which flatters it compared with a network
+round trip.
+"""
+import argparse
+from importlib import import_module
+
+from benchmarks.common import setup_django, timed
+
+
+def measure(engine, repeat, user_id):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    store_class = import_module(engine).SessionStore
+    logged_in = store_class()
+    logged_in['_auth_user_id'] = str(user_id)
+    logged_in.save()
+    key = logged_in.session_key
+
+    def authenticated_request():
+        store_class(key).get('_auth_user_id')
+
+    def anonymous_write():
+        store = store_class()
+        store['email_to_verify'] = 'someone@example.com'
+        store['email_verified'] = True
+        store.save()
+
+    with CaptureQueriesContext(connection) as read_queries:
+        authenticated_request()
+    with CaptureQueriesContext(connection) as write_queries:
+        anonymous_write()
+    return (
+        timed(authenticated_request, repeat), len(read_queries),
+        timed(anonymous_write, repeat), len(write_queries),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    print(f"{'mode':<16}{'auth read (ms)':>16}{'queries':>9}{'anon write (ms)':>17}{'queries':>9}")
+    for mode, engine in settings.SESSION_ENGINES.items():
+        read_ms, read_q, write_ms, write_q = measure(engine, args.repeat, user_id=1)
+        print(f"{mode:<16}{read_ms:>16.3f}{read_q:>9}{write_ms:>17.3f}{write_q:>9}")
+
+
+if __name__ == '__main__':
+    main()